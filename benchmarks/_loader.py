@@ -0,0 +1,25 @@
+"""Helpers to import integration modules from a source checkout."""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.jpoyson_aroma_diffuser"
+
+
+def load(module: str):
+    """Import ``PACKAGE.module`` without running the package ``__init__``.
+
+    The package ``__init__`` pulls in Home Assistant; the pure protocol
+    modules do not need it, so the benchmarks register a bare package object
+    and import the submodule directly.
+    """
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    if PACKAGE not in sys.modules:
+        importlib.import_module("custom_components")
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(ROOT / "custom_components" / "jpoyson_aroma_diffuser")]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
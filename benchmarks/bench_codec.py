@@ -0,0 +1,71 @@
+"""Micro-benchmark for the per-notification frame decode and encode cost.
+
+Run with ``python benchmarks/bench_codec.py``.
+"""
+import timeit
+
+from _loader import load
+
+codec = load("codec")
+frame_reader = load("frame_reader")
+
+STATUS = codec.encode_status(1, 1, codec.TimerSlot(255, 0, 0, 23, 59, 15, 180))
+
+
+def legacy_decode(data):
+    hex_data = data.hex().upper()
+    if not hex_data.startswith("A5FB"):
+        return None
+    return (
+        int(hex_data[4:6], 16) != 0,
+        int(hex_data[6:8], 16),
+        int(hex_data[8:10], 16) - 1,
+        int(hex_data[10:12], 16),
+        int(hex_data[12:14], 16),
+        int(hex_data[14:16], 16),
+        int(hex_data[16:18], 16),
+        int(hex_data[18:22], 16),
+        int(hex_data[22:26], 16),
+    )
+
+
+def legacy_query(time_slot):
+    query_code = [165, 252, time_slot, 0, 0, 0]
+    query_code.append(sum(query_code) & 255)
+    return bytearray(query_code)
+
+
+def legacy_control(power_status):
+    control_code = [165, 250, power_status, 255, 1, 0, 0, 23, 59, 0, 15, 0, 180]
+    control_code.append(sum(control_code) & 255)
+    return bytearray(control_code)
+
+
+def stream_decode(reader, chunks):
+    for chunk in chunks:
+        reader.feed(chunk)
+
+
+def _report(name, stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    print(f"{name:<28} {best / number * 1e9:9.0f} ns/op")
+
+
+def main(number=200_000):
+    _report("decode status (hex)", lambda: legacy_decode(STATUS), number)
+    _report("decode status (codec)", lambda: codec.decode_frame(STATUS), number)
+    reader = frame_reader.FrameReader()
+    _report("stream whole frame", lambda: reader.feed(STATUS), number)
+    fragments = (STATUS[:5], STATUS[5:])
+    _report("stream fragmented frame", lambda: stream_decode(reader, fragments), number)
+    coalesced = STATUS + codec.QUERY_CODES[0] + STATUS
+    _report("stream 3 coalesced frames", lambda: reader.feed(coalesced), number // 3)
+    _report("encode query (list)", lambda: legacy_query(3), number)
+    _report("encode query (codec)", lambda: codec.encode_query(3), number)
+    _report("encode control (list)", lambda: legacy_control(1), number)
+    _report("encode control (codec)", lambda: codec.encode_control(1, 255, 1, 0, 0, 23, 59, 15, 180), number)
+    _report("encode clock (codec)", lambda: codec.encode_clock(3, 12, 30, 45), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""End-to-end benchmarks of DeviceManager against simulated diffusers.
+
+Measures connect-to-ready time (cold and with restored state), command
+round-trip latency, recovery from dropped links, failover between proxies,
+clock frames sent on reconnects and fleet-wide resyncs, notification decode
+throughput and fleet behaviour with 1, 10 and 100 devices, on links with and
+without fragmentation and loss.
+
+Requires the integration's dev dependencies (Home Assistant, bleak).
+Run with ``python benchmarks/bench_e2e.py``.
+"""
+import asyncio
+import statistics
+import time
+
+from homeassistant.const import EVENT_CORE_CONFIG_UPDATE
+from simulator import MemoryStore, create_fleet, shutdown
+
+from custom_components.jpoyson_aroma_diffuser import codec
+from custom_components.jpoyson_aroma_diffuser.clock_sync import get_clock_sync
+from custom_components.jpoyson_aroma_diffuser.const import DATA_PATH_SCORES, DATA_STATE_STORE
+from custom_components.jpoyson_aroma_diffuser.fan_out import fan_out
+
+LINKS = {
+    "clean": {},
+    "fragmented": {"fragment": 5},
+    "coalesced": {"coalesce": True},
+    "lossy": {"loss": 0.1},
+}
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"median {statistics.median(samples) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms"
+
+
+async def connect_to_ready(link, runs=20):
+    samples = []
+    for _ in range(runs):
+        hass, transport, (manager,) = create_fleet(1, **link)
+        started = time.perf_counter()
+        await manager.connect_device(manager.device_id)
+        samples.append(time.perf_counter() - started)
+        await shutdown([manager])
+    return samples
+
+
+async def restart_to_ready(runs=20):
+    """Connect-to-ready after a restart that restores a freshly saved device state."""
+    store = MemoryStore()
+    hass, transport, (manager,) = create_fleet(1, store=store)
+    await hass.data[DATA_STATE_STORE].async_load()
+    await manager.connect_device(manager.device_id)
+    await shutdown([manager])
+
+    samples = []
+    for _ in range(runs):
+        hass, transport, (manager,) = create_fleet(1, store=store)
+        await hass.data[DATA_STATE_STORE].async_load()
+        manager.restore_state()
+        started = time.perf_counter()
+        await manager.connect_device(manager.device_id)
+        samples.append(time.perf_counter() - started)
+        await shutdown([manager])
+    return samples
+
+
+async def command_round_trip(link, runs=50):
+    """Time from issuing a power command until its A5FB echo has been applied."""
+    hass, transport, (manager,) = create_fleet(1, **link)
+    await manager.connect_device(manager.device_id)
+    echoed = asyncio.Event()
+    manager.set_power_status_callback(lambda is_on: echoed.set())
+
+    samples = []
+    for i in range(runs):
+        echoed.clear()
+        command = manager.turn_on_device if i % 2 == 0 else manager.turn_off_device
+        started = time.perf_counter()
+        await manager.async_run_command(command)
+        try:
+            await asyncio.wait_for(echoed.wait(), 1.0)
+        except asyncio.TimeoutError:
+            continue
+        samples.append(time.perf_counter() - started)
+    await shutdown([manager])
+    return samples
+
+
+async def decode_throughput(notifications=100_000):
+    hass, transport, (manager,) = create_fleet(1)
+    await manager.connect_device(manager.device_id)
+    handler = manager.client._handler
+    frames = [codec.encode_status(i & 1, i % codec.TIMER_SLOTS + 1, codec.TimerSlot(255, 0, 0, 23, i % 60, 15, 180))
+              for i in range(64)]
+
+    started = time.perf_counter()
+    for i in range(notifications):
+        handler("bench", frames[i & 63])
+    elapsed = time.perf_counter() - started
+    await shutdown([manager])
+    return notifications / elapsed
+
+
+async def fleet(count):
+    hass, transport, managers = create_fleet(count, connect_latency=0.2)
+    started = time.perf_counter()
+    await asyncio.gather(*(manager.connect_device(manager.device_id) for manager in managers))
+    ready = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await fan_out(managers, lambda manager: manager.async_run_command(manager.turn_on_device))
+    command = time.perf_counter() - started
+
+    connected = sum(manager.ready for manager in managers)
+    await shutdown(managers)
+    return ready, command, connected
+
+
+async def flaky_link(commands=100):
+    """Commands on a link that drops after 10% of writes; measures recovery through the reconnect supervisor."""
+    hass, transport, (manager,) = create_fleet(1, disconnect_rate=0.1)
+    manager.reconnect_supervisor.base_delay = 0.05
+    await manager.connect_device(manager.device_id)
+
+    samples, failures = [], 0
+    for i in range(commands):
+        command = manager.turn_on_device if i % 2 == 0 else manager.turn_off_device
+        started = time.perf_counter()
+        try:
+            ok = await manager.async_run_command(command)
+        except ConnectionError:
+            ok = False
+        if ok:
+            samples.append(time.perf_counter() - started)
+        else:
+            failures += 1
+    diffuser = transport.diffusers[manager.device_id.upper()]
+    await shutdown([manager])
+    return samples, failures, diffuser.disconnects, diffuser.clock_frames
+
+
+async def fleet_resync(count=100, window=1.0):
+    """Resync a connected fleet after its UTC offset changed, as at a DST change.
+
+    Returns the time the batch took and the clock frames sent on connect and
+    by the resync; the resync should send one frame per device, spread over
+    ``window`` seconds.
+    """
+    hass, transport, managers = create_fleet(count)
+    await asyncio.gather(*(manager.connect_device(manager.device_id) for manager in managers))
+    on_connect = sum(diffuser.clock_frames for diffuser in transport.diffusers.values())
+
+    scheduler = get_clock_sync(hass)
+    scheduler.spread_window = window
+    for manager in managers:
+        # Registered by async_start, which the benchmark bypasses to connect directly.
+        scheduler.add(manager)
+        manager.clock_synced_offset += 3600
+    started = time.perf_counter()
+    # Home Assistant fires this when its time zone changes.
+    hass.bus.async_fire(EVENT_CORE_CONFIG_UPDATE)
+    await scheduler._batch
+    await asyncio.gather(*(task for manager in managers for task in manager.config_entry.tasks))
+    elapsed = time.perf_counter() - started
+    resynced = sum(diffuser.clock_frames for diffuser in transport.diffusers.values()) - on_connect
+    await shutdown(managers)
+    return elapsed, on_connect, resynced
+
+
+async def path_failover(runs=10):
+    """Two proxies hear the diffuser: the stronger one cannot connect, the weaker one can.
+
+    The first connect tries the strong proxy and fails over; after that the
+    learned score should send connections to the working proxy first, also
+    after a restart that restores the scores.
+    """
+    paths = {
+        "near-proxy": {"rssi": -55, "connect_latency": 0.2, "reachable": False},
+        "far-proxy": {"rssi": -85, "connect_latency": 0.05, "reachable": True},
+    }
+    path_store = MemoryStore()
+    samples = []
+    for _ in range(runs):
+        hass, transport, (manager,) = create_fleet(1, path_store=path_store, paths=paths)
+        await hass.data[DATA_PATH_SCORES].async_load()
+        started = time.perf_counter()
+        await manager.connect_device(manager.device_id)
+        samples.append(time.perf_counter() - started)
+        await shutdown([manager])
+    return samples
+
+
+async def main():
+    print("connect to ready")
+    for name, link in LINKS.items():
+        print(f"  {name:<12} {_summary(await connect_to_ready(link))}")
+
+    print(f"  {'restored':<12} {_summary(await restart_to_ready())}")
+
+    print("command round trip")
+    for name, link in LINKS.items():
+        samples = await command_round_trip(link)
+        print(f"  {name:<12} {_summary(samples)}  ({len(samples)} echoed)")
+
+    samples = await path_failover()
+    print(f"path failover  first {samples[0] * 1000:.1f} ms  then {_summary(samples[1:])}")
+
+    samples, failures, disconnects, clock_frames = await flaky_link()
+    print(f"flaky link     {_summary(samples)}  ({failures} failed, {disconnects} disconnects, "
+          f"{clock_frames} clock frames)")
+
+    elapsed, on_connect, resynced = await fleet_resync()
+    print(f"clock resync   100 devices in {elapsed:.2f} s  ({on_connect} frames on connect, {resynced} on resync)")
+
+    print(f"notification decode  {await decode_throughput():,.0f} notifications/s")
+
+    print("fleet")
+    for count in (1, 10, 100):
+        ready, command, connected = await fleet(count)
+        print(f"  {count:>4} devices  all ready {ready:6.2f} s  command fan-out {command * 1000:7.1f} ms"
+              f"  ({connected}/{count} ready)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
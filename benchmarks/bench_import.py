@@ -0,0 +1,80 @@
+"""Measure the cold import cost of the integration's modules.
+
+Every sample imports one module in a fresh interpreter, after pre-importing
+the Home Assistant modules that are always loaded by the time Home Assistant
+sets up a custom integration. The reported time is for the module alone, and
+``BLE`` says whether the import pulled in bleak or bleak-retry-connector. Only
+``transport``, which ``DeviceManager`` loads on its first connection attempt,
+and ``config_flow`` should need them. ``config_flow`` gets bleak through Home
+Assistant's bluetooth component, a manifest dependency that is already loaded
+before any flow runs.
+
+Requires the integration's dev dependencies (Home Assistant, bleak).
+Run with ``python benchmarks/bench_import.py``.
+"""
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.jpoyson_aroma_diffuser"
+
+BASELINE = (
+    "asyncio",
+    "logging",
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+)
+
+# (label, module, whether to import it without running the package __init__)
+TARGETS = (
+    ("__init__", PACKAGE, False),
+    ("config_flow", f"{PACKAGE}.config_flow", False),
+    ("switch", f"{PACKAGE}.switch", False),
+    ("sensor", f"{PACKAGE}.sensor", False),
+    ("diagnostics", f"{PACKAGE}.diagnostics", False),
+    ("codec", "codec", True),
+    ("frame_reader", "frame_reader", True),
+    ("transport", f"{PACKAGE}.transport", False),
+)
+
+SNIPPET = """
+import importlib, json, sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {benchmarks!r})
+for name in {baseline!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+started = time.perf_counter()
+if {bare!r}:
+    from _loader import load
+    load({module!r})
+else:
+    importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+loaded = {{name.split(".")[0] for name in set(sys.modules) - before}}
+print(json.dumps([elapsed, bool(loaded & {{"bleak", "bleak_retry_connector"}})]))
+"""
+
+
+def sample(module, bare):
+    code = SNIPPET.format(root=str(ROOT), benchmarks=str(ROOT / "benchmarks"), baseline=BASELINE,
+                          module=module, bare=bare)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs=7):
+    for label, module, bare in TARGETS:
+        samples = [sample(module, bare) for _ in range(runs)]
+        elapsed = statistics.median(seconds for seconds, _ in samples)
+        ble = any(ble for _, ble in samples)
+        print(f"{label:<14} {elapsed * 1000:8.2f} ms  BLE {'yes' if ble else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measure how much config entry setup adds to Home Assistant startup.
+
+Every device is unreachable: connecting to it hangs for ``CONNECT_DELAY``
+seconds and then fails. With setup running the connection in the
+background, the setup time must not grow with the number of devices.
+
+Requires the integration's dev dependencies (Home Assistant, bleak).
+Run with ``python benchmarks/bench_startup.py``.
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from simulator import MemoryStore, SimulatedBus  # noqa: E402
+
+from custom_components import jpoyson_aroma_diffuser as integration  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser import transport  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.const import DATA_PATH_SCORES, DATA_STATE_STORE  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.path_scores import PathScores  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.state_store import DeviceStateStore  # noqa: E402
+
+CONNECT_DELAY = 2.0
+
+
+async def _unreachable(*args, **kwargs):
+    await asyncio.sleep(CONNECT_DELAY)
+    raise TimeoutError("device unreachable")
+
+
+class FakeConfigEntries:
+    async def async_forward_entry_setups(self, entry, platforms):
+        return None
+
+
+class FakeEntry:
+    def __init__(self, hass, index):
+        self.entry_id = f"entry_{index}"
+        self.data = {"device_id": f"AA:BB:CC:DD:{index // 256:02X}:{index % 256:02X}"}
+        self.options = {}
+        self._tasks = hass.tasks
+
+    def async_create_background_task(self, hass, target, name, eager_start=False):
+        task = asyncio.get_running_loop().create_task(target, name=name)
+        self._tasks.append(task)
+        return task
+
+    def add_update_listener(self, listener):
+        return lambda: None
+
+    def async_on_unload(self, func):
+        pass
+
+
+async def run(devices):
+    hass = SimpleNamespace(data={}, config_entries=FakeConfigEntries(), tasks=[], loop=asyncio.get_running_loop(),
+                           bus=SimulatedBus())
+    hass.data[DATA_STATE_STORE] = DeviceStateStore(hass, MemoryStore())
+    hass.data[DATA_PATH_SCORES] = PathScores(hass, MemoryStore())
+    entries = [FakeEntry(hass, i) for i in range(devices)]
+
+    start = time.perf_counter()
+    for entry in entries:
+        await integration.async_setup_entry(hass, entry)
+    elapsed = time.perf_counter() - start
+
+    for task in hass.tasks:
+        task.cancel()
+    await asyncio.gather(*hass.tasks, return_exceptions=True)
+    return elapsed
+
+
+def main():
+    transport.bluetooth.async_scanner_devices_by_address = lambda hass, address, connectable: []
+    transport.bluetooth.async_ble_device_from_address = lambda hass, address, connectable: object()
+    transport.establish_connection = _unreachable
+    for devices in (1, 10, 100):
+        elapsed = asyncio.run(run(devices))
+        print(f"{devices:>4} unreachable devices: setup took {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""In-process simulated diffuser speaking the A5FA/A5FB/A5FC/A5FD protocol.
+
+``SimulatedTransport`` can be passed to ``DeviceManager`` in place of the
+default Bluetooth transport, so the whole integration stack runs without a
+radio. Link behaviour (latency, lost or fragmented notifications, coalesced
+notifications and random disconnects) is configurable per device.
+"""
+import asyncio
+import collections
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import is_callback  # noqa: E402
+
+from custom_components.jpoyson_aroma_diffuser import codec  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.const import DATA_PATH_SCORES, DATA_STATE_STORE  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.device_manager import (  # noqa: E402
+    DeviceManager, NOTIFICATION_CHARACTERISTIC_UUID, SERVICE_CHARACTERISTIC_UUID,
+)
+from custom_components.jpoyson_aroma_diffuser.frame_reader import FrameReader  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.path_scores import PathCandidate, PathScores  # noqa: E402
+from custom_components.jpoyson_aroma_diffuser.state_store import DeviceStateStore  # noqa: E402
+
+DEFAULT_SLOT = codec.TimerSlot(255, 0, 0, 23, 59, 15, 180)
+EMPTY_SLOT = codec.TimerSlot(0, 0, 0, 0, 0, 0, 0)
+
+
+class SimulatedDiffuser:
+    """Protocol state of one diffuser and the quality of its radio link."""
+
+    def __init__(self, address, *, latency=0.005, connect_latency=0.05, loss=0.0, fragment=0,
+                 coalesce=False, disconnect_rate=0.0, reachable=True, paths=None, seed=None):
+        self.address = address
+        # Scanners that hear this diffuser: {source: {"rssi", "connect_latency", "reachable"}}.
+        # Without it the diffuser is reached through the transport's single default source.
+        self.paths = paths
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.loss = loss
+        self.fragment = fragment
+        self.coalesce = coalesce
+        self.disconnect_rate = disconnect_rate
+        self.reachable = reachable
+        self.rng = random.Random(seed)
+
+        self.power = False
+        self.slots = [DEFAULT_SLOT] + [EMPTY_SLOT] * (codec.TIMER_SLOTS - 1)
+        self.clock = None
+        self.clock_frames = 0
+        self.frames_received = 0
+        self.notifications_sent = 0
+        self.notifications_lost = 0
+        self.disconnects = 0
+
+    def handle(self, frame):
+        """Apply a frame written by the host and return the reply bytes."""
+        self.frames_received += 1
+        if type(frame) is codec.SlotFrame and frame.frame_type == codec.FRAME_CONTROL:
+            self.power = frame.power
+            if 1 <= frame.slot <= codec.TIMER_SLOTS:
+                self.slots[frame.slot - 1] = frame.timer
+            return self.status(frame.slot)
+        if type(frame) is codec.QueryFrame:
+            return self.status(frame.slot)
+        if type(frame) is codec.ClockFrame:
+            self.clock = frame
+            self.clock_frames += 1
+        return b""
+
+    def status(self, slot):
+        if not 1 <= slot <= codec.TIMER_SLOTS:
+            return b""
+        return codec.encode_status(int(self.power), slot, self.slots[slot - 1])
+
+
+class _Services:
+    def __init__(self):
+        self._characteristics = {
+            SERVICE_CHARACTERISTIC_UUID: SimpleNamespace(
+                uuid=SERVICE_CHARACTERISTIC_UUID, properties=["write", "write-without-response"]),
+            NOTIFICATION_CHARACTERISTIC_UUID: SimpleNamespace(
+                uuid=NOTIFICATION_CHARACTERISTIC_UUID, properties=["notify"]),
+        }
+
+    def get_characteristic(self, uuid):
+        return self._characteristics.get(uuid)
+
+
+class SimulatedClient:
+    """Stands in for a connected BleakClient."""
+
+    def __init__(self, diffuser: SimulatedDiffuser, disconnected_callback):
+        self.diffuser = diffuser
+        self.services = _Services()
+        self._disconnected_callback = disconnected_callback
+        self._connected = True
+        self._handler = None
+        self._reader = FrameReader()
+        self._outbox = collections.deque()
+        self._pump = None
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    async def start_notify(self, uuid, handler):
+        self._handler = handler
+
+    async def write_gatt_char(self, uuid, data, response=True):
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        diffuser = self.diffuser
+        if response:
+            await asyncio.sleep(diffuser.latency)
+        reply = b"".join(diffuser.handle(frame) for frame in self._reader.feed(data))
+        if reply:
+            self._send(reply)
+        if diffuser.disconnect_rate and diffuser.rng.random() < diffuser.disconnect_rate:
+            self.drop()
+
+    async def disconnect(self):
+        self._connected = False
+        self._outbox.clear()
+
+    def drop(self):
+        """Simulate an unexpected link loss."""
+        if not self._connected:
+            return
+        self._connected = False
+        self._outbox.clear()
+        self.diffuser.disconnects += 1
+        if self._disconnected_callback:
+            self._disconnected_callback(self)
+
+    def _send(self, payload):
+        diffuser = self.diffuser
+        if diffuser.loss and diffuser.rng.random() < diffuser.loss:
+            diffuser.notifications_lost += 1
+            return
+        size = diffuser.fragment or len(payload)
+        due = asyncio.get_running_loop().time() + diffuser.latency
+        for offset in range(0, len(payload), size):
+            self._outbox.append((due, payload[offset:offset + size]))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._deliver())
+
+    async def _deliver(self):
+        loop = asyncio.get_running_loop()
+        while self._outbox:
+            delay = self._outbox[0][0] - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if not self._outbox:
+                    # Link dropped while the reply was in flight.
+                    break
+            if self.diffuser.coalesce:
+                # Hand over everything that is due as one notification.
+                now = loop.time()
+                chunks = []
+                while self._outbox and self._outbox[0][0] <= now:
+                    chunks.append(self._outbox.popleft()[1])
+                chunk = b"".join(chunks)
+            else:
+                chunk = self._outbox.popleft()[1]
+            if self._connected and self._handler and chunk:
+                self.diffuser.notifications_sent += 1
+                self._handler(NOTIFICATION_CHARACTERISTIC_UUID, bytearray(chunk))
+
+
+class SimulatedPath(SimpleNamespace):
+    """The BLEDevice of a diffuser as seen through one scanner."""
+
+
+class SimulatedTransport:
+    """Drop-in replacement for the Bluetooth transport of ``DeviceManager``."""
+
+    def __init__(self, diffusers, source="simulated-proxy"):
+        self.diffusers = {diffuser.address.upper(): diffuser for diffuser in diffusers}
+        self.source_name = source
+        self.connects = 0
+
+    def find_device(self, address):
+        diffuser = self.diffusers.get(address.upper())
+        return diffuser if diffuser is not None and diffuser.reachable else None
+
+    def candidates(self, address):
+        diffuser = self.diffusers.get(address.upper())
+        if diffuser is None or not diffuser.paths:
+            return []
+        return [
+            PathCandidate(SimulatedPath(diffuser=diffuser, source=source, **path), source, path["rssi"], None)
+            for source, path in diffuser.paths.items()
+        ]
+
+    def source(self, ble_device):
+        return getattr(ble_device, "source", self.source_name)
+
+    def last_service_info(self, address):
+        if self.find_device(address) is None:
+            return None
+        return SimpleNamespace(rssi=-60, source=self.source_name)
+
+    async def connect(self, ble_device, name, disconnected_callback, ble_device_callback):
+        await asyncio.sleep(ble_device.connect_latency)
+        if not ble_device.reachable:
+            raise TimeoutError(f"{name} is out of range")
+        self.connects += 1
+        diffuser = ble_device.diffuser if isinstance(ble_device, SimulatedPath) else ble_device
+        return SimulatedClient(diffuser, disconnected_callback)
+
+
+class MemoryStore:
+    """Stands in for homeassistant.helpers.storage.Store, keeping the data in memory."""
+
+    def __init__(self, data=None):
+        self.data = data
+        self.saves = 0
+
+    async def async_load(self):
+        return self.data
+
+    def async_delay_save(self, data_func, delay=0):
+        self.data = data_func()
+        self.saves += 1
+
+
+class SimulatedBus:
+    """Event bus that runs listeners the way Home Assistant does.
+
+    Coroutine functions become tasks, ``@callback`` functions run inline and
+    anything else runs in the executor.
+    """
+
+    def __init__(self):
+        self.listeners = collections.defaultdict(list)
+
+    def async_listen(self, event_type, listener):
+        self.listeners[event_type].append(listener)
+        return lambda: self.listeners[event_type].remove(listener)
+
+    def async_fire(self, event_type, data=None):
+        loop = asyncio.get_running_loop()
+        event = SimpleNamespace(event_type=event_type, data=data or {})
+        for listener in list(self.listeners[event_type]):
+            if asyncio.iscoroutinefunction(listener):
+                loop.create_task(listener(event))
+            elif is_callback(listener):
+                listener(event)
+            else:
+                loop.run_in_executor(None, listener, event)
+
+
+class SimulatedHass:
+    """The parts of HomeAssistant that DeviceManager touches."""
+
+    def __init__(self, store=None, path_store=None):
+        self.data = {
+            DATA_STATE_STORE: DeviceStateStore(self, store or MemoryStore()),
+            DATA_PATH_SCORES: PathScores(self, path_store or MemoryStore()),
+        }
+        self.loop = asyncio.get_running_loop()
+        self.bus = SimulatedBus()
+
+
+class SimulatedConfigEntry:
+    def __init__(self, address, options=None):
+        self.entry_id = f"sim_{address.replace(':', '').lower()}"
+        self.data = {"device_id": address}
+        self.options = options or {}
+        self.tasks = []
+
+    def async_create_background_task(self, hass, target, name, eager_start=False):
+        task = hass.loop.create_task(target, name=name)
+        self.tasks.append(task)
+        return task
+
+
+def address(index):
+    return f"AA:BB:CC:{index >> 16 & 0xFF:02X}:{index >> 8 & 0xFF:02X}:{index & 0xFF:02X}"
+
+
+def create_fleet(count, options=None, store=None, path_store=None, **link):
+    """Return ``(hass, transport, managers)`` for ``count`` simulated diffusers.
+
+    Pass a loaded ``MemoryStore`` as ``store`` or ``path_store`` to simulate a
+    restart with saved device state or path scores.
+    """
+    hass = SimulatedHass(store, path_store)
+    diffusers = [SimulatedDiffuser(address(i), seed=i, **link) for i in range(count)]
+    transport = SimulatedTransport(diffusers)
+    managers = [
+        DeviceManager(hass, SimulatedConfigEntry(diffuser.address, options), transport=transport)
+        for diffuser in diffusers
+    ]
+    return hass, transport, managers
+
+
+async def shutdown(managers):
+    for manager in managers:
+        await manager.async_shutdown()
+        for task in manager.config_entry.tasks:
+            task.cancel()
+        await asyncio.gather(*manager.config_entry.tasks, return_exceptions=True)
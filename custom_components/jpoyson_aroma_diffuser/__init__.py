@@ -2,12 +2,16 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, WORKING_TIME, PAUSE_TIME
+from .const import DOMAIN, DEVICE_ID
 from .device_manager import DeviceManager
+from .path_scores import get_path_scores
+from .services import async_setup_services
+from .state_store import get_state_store
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the JPoyson Aroma Diffuser component."""
+    async_setup_services(hass)
     return True
 
 
@@ -15,24 +19,48 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up JPoyson Aroma Diffuser from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
-    device_id = entry.data["device_id"]
+    # Restore the last known state before the platforms create their entities.
+    await get_state_store(hass).async_load()
+    await get_path_scores(hass).async_load()
     manager = DeviceManager(hass=hass, config_entry=entry)
-
-    await manager.connect_device(device_id)
+    manager.restore_state()
     hass.data[DOMAIN][entry.entry_id] = manager
 
+    # Connecting can take minutes when the device is out of range, so it must
+    # not hold up Home Assistant startup. Entities stay unavailable until the
+    # handshake has completed.
+    manager.async_start()
+    entry.async_on_unload(entry.add_update_listener(async_options_updated))
+
     await hass.config_entries.async_forward_entry_setups(entry, ["switch", "sensor"])
 
     return True
 
 
+async def async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply changed options without a reload; the scent program service updates them too."""
+    manager = hass.data[DOMAIN].get(entry.entry_id)
+    if manager:
+        manager.apply_connection_mode()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a JPoyson Aroma Diffuser config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["switch", "sensor"])
 
     # Remove the manager from hass.data and handle disconnection
     manager = hass.data[DOMAIN].pop(entry.entry_id, None)
-    if manager and manager.client:
-        await manager.client.disconnect()
+    if manager:
+        await manager.async_shutdown()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Forget the saved state and path scores of a removed diffuser."""
+    store = get_state_store(hass)
+    await store.async_load()
+    store.remove(entry.data.get(DEVICE_ID))
+    scores = get_path_scores(hass)
+    await scores.async_load()
+    scores.remove(entry.data.get(DEVICE_ID))
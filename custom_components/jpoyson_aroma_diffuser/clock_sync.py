@@ -0,0 +1,122 @@
+"""Hass-wide scheduler that keeps the diffusers' clocks in sync.
+
+The device does not acknowledge clock frames, so the scheduler tracks when
+each device was last synced and under which UTC offset. A connection only
+sends a clock frame when that sync is stale. One periodic check finds devices
+whose sync interval has expired or whose offset no longer matches, e.g. after
+a DST change or a new Home Assistant time zone, and resyncs them spread out
+over a window, so the adapters and proxies are not flooded.
+"""
+import asyncio
+import logging
+import time
+
+from homeassistant.const import EVENT_CORE_CONFIG_UPDATE
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_CLOCK_SYNC
+
+logger = logging.getLogger(__package__)
+
+CHECK_INTERVAL = 600  # Seconds between checks for expired syncs and offset changes
+SPREAD_WINDOW = 60.0  # Seconds a fleet-wide resync is spread over
+MAX_SPACING = 1.0  # Seconds between two resyncs of the same batch at most
+
+
+def utc_offset() -> int:
+    """Current offset of Home Assistant's time zone from UTC, in seconds."""
+    return int(dt_util.now().utcoffset().total_seconds())
+
+
+def get_clock_sync(hass) -> "ClockSyncScheduler":
+    """Return the scheduler shared by every config entry of this integration."""
+    scheduler = hass.data.get(DATA_CLOCK_SYNC)
+    if scheduler is None:
+        scheduler = hass.data[DATA_CLOCK_SYNC] = ClockSyncScheduler(hass)
+    return scheduler
+
+
+class ClockSyncScheduler:
+    def __init__(self, hass):
+        self.hass = hass
+        self._managers = set()
+        self._timer = None
+        self._unsub_config = None
+        self._batch = None
+        self.spread_window = SPREAD_WINDOW
+        self.resyncs = 0
+
+    def add(self, manager):
+        self._managers.add(manager)
+        if self._timer is None:
+            self._timer = self.hass.loop.call_later(CHECK_INTERVAL, self._check)
+            # A new time zone changes the offset right away; don't wait for the next check.
+            self._unsub_config = self.hass.bus.async_listen(EVENT_CORE_CONFIG_UPDATE, self._config_updated)
+
+    def remove(self, manager):
+        self._managers.discard(manager)
+        if not self._managers:
+            self.stop()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._unsub_config is not None:
+            self._unsub_config()
+            self._unsub_config = None
+        if self._batch is not None:
+            self._batch.cancel()
+            self._batch = None
+
+    @staticmethod
+    def is_stale(manager, now=None, offset=None) -> bool:
+        """Whether ``manager``'s device clock needs a clock frame."""
+        if manager.clock_synced_at is None:
+            return True
+        if manager.clock_synced_offset != (utc_offset() if offset is None else offset):
+            return True
+        now = time.time() if now is None else now
+        return now - manager.clock_synced_at >= manager.clock_sync_interval
+
+    @callback
+    def _config_updated(self, event):
+        self.resync()
+
+    def _check(self):
+        self._timer = self.hass.loop.call_later(CHECK_INTERVAL, self._check)
+        self.resync()
+
+    def resync(self, force=False):
+        """Resync every connected device whose clock is stale, or all of them with ``force``.
+
+        Devices that are not connected are synced on their next connection.
+        """
+        if self._batch is not None and not self._batch.done():
+            return
+        now, offset = time.time(), utc_offset()
+        due = [
+            manager for manager in self._managers
+            if manager.ready and manager.connected and (force or self.is_stale(manager, now, offset))
+        ]
+        if due:
+            logger.debug("Resyncing the clocks of %s devices", len(due))
+            self._batch = self.hass.loop.create_task(self._sync_batch(due))
+
+    async def _sync_batch(self, managers):
+        spacing = min(MAX_SPACING, self.spread_window / len(managers))
+        for index, manager in enumerate(managers):
+            if index:
+                await asyncio.sleep(spacing)
+            # Each write runs on its own so a slow device does not hold up the rest of the batch.
+            manager.async_schedule_clock_sync()
+            self.resyncs += 1
+
+    def metrics(self) -> dict:
+        return {
+            "devices": len(self._managers),
+            "stale": sum(self.is_stale(manager) for manager in self._managers),
+            "resyncs": self.resyncs,
+            "utc_offset": utc_offset(),
+        }
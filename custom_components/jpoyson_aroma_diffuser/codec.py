@@ -0,0 +1,172 @@
+"""Binary codec for the JPoyson diffuser BLE protocol.
+
+Every frame starts with the 0xA5 header byte, followed by a frame type byte
+and a fixed-size payload. The last byte is the low byte of the sum of all
+preceding bytes.
+
+    A5FA  control   host -> device, sets power and one timer slot
+    A5FB  status    device -> host, reports power and one timer slot
+    A5FC  query     host -> device, asks for the status of one timer slot
+    A5FD  clock     host -> device, sets the device clock
+"""
+import struct
+from functools import lru_cache
+from typing import NamedTuple, Union
+
+HEADER = 0xA5
+
+FRAME_CONTROL = 0xFA
+FRAME_STATUS = 0xFB
+FRAME_QUERY = 0xFC
+FRAME_CLOCK = 0xFD
+
+TIMER_SLOTS = 4
+
+# header, type, power, week, slot, start h/m, stop h/m, working, pause, checksum
+_SLOT_FRAME = struct.Struct(">BBBBBBBBBHHB")
+# week, (slot), start h/m, stop h/m, working, pause; read from offset 3
+_SLOT_TIMER = struct.Struct(">BxBBBBHH")
+# header, type, slot, 3 reserved bytes, checksum
+_QUERY_FRAME = struct.Struct(">BBB3xB")
+# header, type, weekday, hour, minute, second, 6 reserved bytes, checksum
+_CLOCK_FRAME = struct.Struct(">BBBBBB6xB")
+
+FRAME_LENGTHS = {
+    FRAME_CONTROL: _SLOT_FRAME.size,
+    FRAME_STATUS: _SLOT_FRAME.size,
+    FRAME_QUERY: _QUERY_FRAME.size,
+    FRAME_CLOCK: _CLOCK_FRAME.size,
+}
+
+
+class FrameError(ValueError):
+    """Raised when a buffer does not hold a well-formed frame."""
+
+
+class ChecksumError(FrameError):
+    """Raised when a frame fails checksum verification."""
+
+
+class TimerSlot(NamedTuple):
+    week: int
+    start_hour: int
+    start_min: int
+    stop_hour: int
+    stop_min: int
+    working_time: int
+    pause_time: int
+
+
+class SlotFrame(NamedTuple):
+    """A decoded A5FA control or A5FB status frame."""
+    frame_type: int
+    power: bool
+    slot: int
+    timer: TimerSlot
+
+
+class QueryFrame(NamedTuple):
+    slot: int
+
+
+class ClockFrame(NamedTuple):
+    weekday: int
+    hour: int
+    minute: int
+    second: int
+
+
+Frame = Union[SlotFrame, QueryFrame, ClockFrame]
+
+
+def checksum(data) -> int:
+    """Return the checksum byte for the given frame body."""
+    return sum(data) & 0xFF
+
+
+def _seal(frame: bytearray) -> bytes:
+    frame[-1] = sum(memoryview(frame)[:-1]) & 0xFF
+    return bytes(frame)
+
+
+@lru_cache(maxsize=64)
+def encode_control(power: int, week: int, slot: int, start_hour: int, start_min: int,
+                   stop_hour: int, stop_min: int, working_time: int, pause_time: int) -> bytes:
+    """Build an A5FA control frame for one timer slot."""
+    frame = bytearray(_SLOT_FRAME.size)
+    _SLOT_FRAME.pack_into(frame, 0, HEADER, FRAME_CONTROL, power & 0xFF, week & 0xFF, slot & 0xFF,
+                          start_hour & 0xFF, start_min & 0xFF, stop_hour & 0xFF, stop_min & 0xFF,
+                          working_time & 0xFFFF, pause_time & 0xFFFF, 0)
+    return _seal(frame)
+
+
+def encode_clock(weekday: int, hour: int, minute: int, second: int) -> bytes:
+    """Build an A5FD clock frame. ``weekday`` is 1 (Monday) to 7 (Sunday)."""
+    frame = bytearray(_CLOCK_FRAME.size)
+    _CLOCK_FRAME.pack_into(frame, 0, HEADER, FRAME_CLOCK, weekday, hour, minute, second, 0)
+    return _seal(frame)
+
+
+def _encode_query(slot: int) -> bytes:
+    frame = bytearray(_QUERY_FRAME.size)
+    _QUERY_FRAME.pack_into(frame, 0, HEADER, FRAME_QUERY, slot & 0xFF, 0)
+    return _seal(frame)
+
+
+# Query frames never change, so they are encoded once at import time.
+QUERY_CODES = tuple(_encode_query(slot) for slot in range(1, TIMER_SLOTS + 1))
+
+
+def encode_query(slot: int) -> bytes:
+    """Return the A5FC query frame for a 1-based timer slot."""
+    if 1 <= slot <= TIMER_SLOTS:
+        return QUERY_CODES[slot - 1]
+    return _encode_query(slot)
+
+
+def encode_status(power: int, slot: int, timer: TimerSlot) -> bytes:
+    """Build an A5FB status frame, as sent by the device."""
+    frame = bytearray(_SLOT_FRAME.size)
+    _SLOT_FRAME.pack_into(frame, 0, HEADER, FRAME_STATUS, power & 0xFF, timer.week & 0xFF, slot & 0xFF,
+                          timer.start_hour, timer.start_min, timer.stop_hour, timer.stop_min,
+                          timer.working_time & 0xFFFF, timer.pause_time & 0xFFFF, 0)
+    return _seal(frame)
+
+
+def frame_length(frame_type: int) -> int:
+    """Return the total length of a frame type, or 0 if the type is unknown."""
+    return FRAME_LENGTHS.get(frame_type, 0)
+
+
+def verify(data) -> memoryview:
+    """Check header, length and checksum; return a memoryview over the frame."""
+    view = data if type(data) is memoryview else memoryview(data)
+    if len(view) < 2 or view[0] != HEADER:
+        raise FrameError("Missing frame header")
+    length = FRAME_LENGTHS.get(view[1])
+    if length is None:
+        raise FrameError(f"Unknown frame type 0x{view[1]:02X}")
+    if len(view) < length:
+        raise FrameError(f"Truncated frame: {len(view)} of {length} bytes")
+    view = view[:length]
+    if sum(view[:-1]) & 0xFF != view[-1]:
+        raise ChecksumError("Frame checksum mismatch")
+    return view
+
+
+# NamedTuple.__new__ goes through keyword handling; building the tuple
+# directly keeps decoding cheap on the notification path.
+_new = tuple.__new__
+
+
+def decode_frame(data) -> Frame:
+    """Decode a single frame without copying the underlying buffer."""
+    view = verify(data)
+    frame_type = view[1]
+    if frame_type == FRAME_STATUS or frame_type == FRAME_CONTROL:
+        timer = _new(TimerSlot, _SLOT_TIMER.unpack_from(view, 3))
+        return _new(SlotFrame, (frame_type, view[2] != 0, view[4], timer))
+    if frame_type == FRAME_QUERY:
+        return QueryFrame(view[2])
+    _, _, weekday, hour, minute, second, _ = _CLOCK_FRAME.unpack_from(view)
+    return ClockFrame(weekday, hour, minute, second)
@@ -0,0 +1,126 @@
+"""Serialized, prioritized GATT write pipeline for one diffuser."""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Awaitable, Callable, Optional
+
+PRIORITY_POWER = 0
+PRIORITY_CLOCK = 1
+PRIORITY_QUERY = 2
+
+logger = logging.getLogger(__package__)
+
+
+class _Command:
+    __slots__ = ("priority", "seq", "key", "frame", "response", "waiters")
+
+    def __init__(self, priority, seq, key, frame, response):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.frame = frame
+        self.response = response
+        self.waiters = []
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class CommandQueue:
+    """Orders writes to one device by priority and coalesces superseded frames.
+
+    Commands submitted with the same ``key`` while an earlier one is still
+    waiting are merged: the queued frame is replaced by the latest one and
+    every submitter is resolved once that frame has been written.
+    """
+
+    def __init__(self, write: Callable[[bytes, bool], Awaitable[None]]):
+        self._write = write
+        self._heap = []
+        self._pending = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def submit(self, frame: bytes, priority: int = PRIORITY_POWER, key=None, response: bool = True):
+        """Queue a frame and wait until it has been written to the device."""
+        await self._enqueue(frame, priority, key, response)
+
+    async def submit_many(self, frames, priority: int = PRIORITY_POWER, response: bool = True):
+        """Queue ``(key, frame)`` pairs back to back and wait until all have been written."""
+        futures = [self._enqueue(frame, priority, key, response) for key, frame in frames]
+        await asyncio.gather(*futures)
+
+    def _enqueue(self, frame, priority, key, response) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        command = self._pending.get(key) if key is not None else None
+        if command is not None:
+            command.frame = frame
+            command.response = command.response or response
+            self.coalesced += 1
+        else:
+            command = _Command(priority, next(self._seq), key, frame, response)
+            heapq.heappush(self._heap, command)
+            if key is not None:
+                self._pending[key] = command
+            self._wakeup.set()
+        command.waiters.append(future)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def clear(self, exc: Optional[BaseException] = None):
+        """Drop every queued command, failing its submitters with ``exc``."""
+        exc = exc or ConnectionError("Command queue cleared")
+        while self._heap:
+            command = heapq.heappop(self._heap)
+            for future in command.waiters:
+                if not future.done():
+                    future.set_exception(exc)
+        self._pending.clear()
+
+    async def stop(self):
+        """Stop the writer task and fail everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.clear()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            command = heapq.heappop(self._heap)
+            if command.key is not None:
+                self._pending.pop(command.key, None)
+
+            try:
+                await self._write(command.frame, command.response)
+            except asyncio.CancelledError:
+                for future in command.waiters:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.debug("Write failed: %s", e)
+                for future in command.waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.written += 1
+                for future in command.waiters:
+                    if not future.done():
+                        future.set_result(None)
@@ -3,18 +3,65 @@ import logging
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.components import bluetooth
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
 from homeassistant.core import callback
 from homeassistant.helpers import selector
 from homeassistant.helpers.selector import SelectOptionDict
 
-from .const import DOMAIN, DEVICE_ID, WORKING_TIME, PAUSE_TIME
+from .const import (
+    DOMAIN, DEVICE_ID, WORKING_TIME, PAUSE_TIME, WRITE_WITHOUT_RESPONSE, CONNECTION_MODE, CONNECTION_MODE_PERSISTENT,
+    CONNECTION_MODE_ON_DEMAND, IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT, SERVICE_UUID, CLOCK_SYNC_INTERVAL,
+    DEFAULT_CLOCK_SYNC_INTERVAL,
+)
 
 logger = logging.getLogger(__package__)
 
 
+def is_diffuser(service_info: BluetoothServiceInfoBleak) -> bool:
+    """Whether an advertisement comes from a JPoyson diffuser."""
+    return SERVICE_UUID in (uuid.lower() for uuid in service_info.service_uuids)
+
+
 class JPoysonAromaDiffuserConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self):
+        self._discovery_info = None
+
+    async def async_step_bluetooth(self, discovery_info: BluetoothServiceInfoBleak):
+        """Handle a diffuser found by Home Assistant's passive Bluetooth discovery."""
+        await self.async_set_unique_id(discovery_info.address)
+        self._abort_if_unique_id_configured()
+        if not is_diffuser(discovery_info):
+            return self.async_abort(reason="not_supported")
+
+        self._discovery_info = discovery_info
+        self.context["title_placeholders"] = {"name": discovery_info.name or discovery_info.address}
+        return await self.async_step_bluetooth_confirm()
+
+    async def async_step_bluetooth_confirm(self, user_input=None):
+        """Confirm setup of a discovered diffuser."""
+        discovery_info = self._discovery_info
+        if user_input is not None:
+            return self.async_create_entry(
+                title=f"JPoyson Aroma Diffuser ({discovery_info.address})",
+                data={
+                    DEVICE_ID: discovery_info.address,
+                    WORKING_TIME: user_input.get(WORKING_TIME, 15),
+                    PAUSE_TIME: user_input.get(PAUSE_TIME, 180),
+                }
+            )
+
+        self._set_confirm_only()
+        return self.async_show_form(
+            step_id="bluetooth_confirm",
+            data_schema=vol.Schema({
+                vol.Optional(WORKING_TIME, default=15): int,
+                vol.Optional(PAUSE_TIME, default=180): int,
+            }),
+            description_placeholders={"name": discovery_info.name or discovery_info.address},
+        )
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
@@ -27,7 +74,8 @@ class JPoysonAromaDiffuserConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             if not device_id and not manual_device_id:
                 errors["base"] = "invalid_device_id"
             else:
-                await self.async_set_unique_id(device_id or manual_device_id)
+                # Devices in the dropdown usually have a discovery flow pending; this flow takes over from it.
+                await self.async_set_unique_id(device_id or manual_device_id, raise_on_progress=False)
                 self._abort_if_unique_id_configured()
 
                 return self.async_create_entry(
@@ -39,57 +87,49 @@ class JPoysonAromaDiffuserConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     }
                 )
 
-        # Discover available devices
-        logger.debug("Calling async_step_user...")
-        devices = await self._async_discover_devices()
+        devices = self._async_discover_devices()
         logger.debug("Discovered devices: %s", devices)
 
-        if not devices:
-            logger.debug("No BLE devices found.")
-            return self.async_abort(reason="no_devices_found")
-
         # Extract device IDs and names from the list of devices
         device_options: list[SelectOptionDict] = [
             SelectOptionDict(label=device["name"], value=device["address"]) for device in devices
         ]
-        logger.debug("Device options: %s", device_options)
 
-        # Show form with device selection dropdown and initial working/pause time settings
+        # Show form with device selection dropdown and initial working/pause time settings.
+        # The address can always be entered manually, e.g. for a device that is not advertising right now.
+        schema = {vol.Optional("manual_device_id"): str}
+        if device_options:
+            schema[vol.Optional("device_id")] = selector.SelectSelector(
+                selector.SelectSelectorConfig(options=device_options),
+            )
+        schema[vol.Optional(WORKING_TIME, default=15)] = int
+        schema[vol.Optional(PAUSE_TIME, default=180)] = int
+
         return self.async_show_form(
             step_id="user",
-            data_schema=vol.Schema({
-                vol.Optional("manual_device_id"): str,
-                vol.Optional("device_id"): selector.SelectSelector(
-                    selector.SelectSelectorConfig(options=device_options),
-                ),
-                vol.Optional(WORKING_TIME, default=15): int,
-                vol.Optional(PAUSE_TIME, default=180): int,
-            }),
+            data_schema=vol.Schema(schema),
             errors=errors
         )
 
-    async def _async_discover_devices(self):
-        """Discover BLE devices using Home Assistant's bluetooth integration."""
-        logger.debug("Discovering BLE devices...")
-        try:
-            # Use Home Assistant's bluetooth scanner for better reliability
-            scanner = bluetooth.async_get_scanner(self.hass)
-            discovered_devices = await scanner.discover(timeout=10.0)
-            logger.debug("Discovered %d BLE devices", len(discovered_devices))
-            
-            # Filter and format devices
-            devices = []
-            for device in discovered_devices:
-                if device.name:  # Only include devices with names
-                    devices.append({
-                        "name": device.name,
-                        "address": device.address
-                    })
-            
-            return devices
-        except Exception as e:
-            logger.error("Error discovering BLE devices: %s", e)
-            return []
+    @callback
+    def _async_discover_devices(self):
+        """List diffusers from the advertisements Home Assistant has already collected.
+
+        When none advertises the diffuser service, named connectable devices are
+        listed instead, as the user step did before it matched on the service.
+        """
+        configured = self._async_current_ids()
+        infos = [
+            info for info in bluetooth.async_discovered_service_info(self.hass, connectable=True)
+            if info.address not in configured
+        ]
+        diffusers = [info for info in infos if is_diffuser(info)]
+        if diffusers:
+            return [
+                {"name": f"{info.name} ({info.address})" if info.name else info.address, "address": info.address}
+                for info in diffusers
+            ]
+        return [{"name": f"{info.name} ({info.address})", "address": info.address} for info in infos if info.name]
 
     @staticmethod
     @callback
@@ -104,8 +144,14 @@ class JPoysonAromaDiffuserOptionsFlowHandler(config_entries.OptionsFlow):
             return self.async_create_entry(
                 title="",
                 data={
+                    # Keep options that are set through services, such as the scent program.
+                    **self.config_entry.options,
                     WORKING_TIME: user_input.get(WORKING_TIME, 15),
                     PAUSE_TIME: user_input.get(PAUSE_TIME, 180),
+                    WRITE_WITHOUT_RESPONSE: user_input.get(WRITE_WITHOUT_RESPONSE, False),
+                    CONNECTION_MODE: user_input.get(CONNECTION_MODE, CONNECTION_MODE_PERSISTENT),
+                    IDLE_TIMEOUT: user_input.get(IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+                    CLOCK_SYNC_INTERVAL: user_input.get(CLOCK_SYNC_INTERVAL, DEFAULT_CLOCK_SYNC_INTERVAL),
                 }
             )
 
@@ -114,5 +160,18 @@ class JPoysonAromaDiffuserOptionsFlowHandler(config_entries.OptionsFlow):
             data_schema=vol.Schema({
                 vol.Optional(WORKING_TIME, default=self.config_entry.options.get(WORKING_TIME, 15)): int,
                 vol.Optional(PAUSE_TIME, default=self.config_entry.options.get(PAUSE_TIME, 180)): int,
+                vol.Optional(WRITE_WITHOUT_RESPONSE,
+                             default=self.config_entry.options.get(WRITE_WITHOUT_RESPONSE, False)): bool,
+                vol.Optional(CONNECTION_MODE,
+                             default=self.config_entry.options.get(CONNECTION_MODE, CONNECTION_MODE_PERSISTENT)):
+                    selector.SelectSelector(selector.SelectSelectorConfig(
+                        options=[CONNECTION_MODE_PERSISTENT, CONNECTION_MODE_ON_DEMAND],
+                        translation_key=CONNECTION_MODE,
+                    )),
+                vol.Optional(IDLE_TIMEOUT, default=self.config_entry.options.get(IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT)):
+                    vol.All(int, vol.Range(min=1)),
+                vol.Optional(CLOCK_SYNC_INTERVAL,
+                             default=self.config_entry.options.get(CLOCK_SYNC_INTERVAL, DEFAULT_CLOCK_SYNC_INTERVAL)):
+                    vol.All(int, vol.Range(min=1)),
             })
         )
@@ -0,0 +1,155 @@
+"""Hass-wide admission control for BLE connection attempts.
+
+Adapters and ESPHome proxies only have a few connection slots. Every
+``DeviceManager`` asks the broker for a ticket before connecting; the broker
+admits a bounded number of concurrent attempts per adapter or proxy and
+queues the rest fairly, interactive requests ahead of background reconnects.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+
+from .const import DATA_CONNECTION_BROKER
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+DEFAULT_CONCURRENT_CONNECTS = 2  # Per adapter or proxy
+DEFAULT_SOURCE = "default"
+
+
+def get_connection_broker(hass) -> "ConnectionBroker":
+    """Return the broker shared by every config entry of this integration."""
+    broker = hass.data.get(DATA_CONNECTION_BROKER)
+    if broker is None:
+        broker = hass.data[DATA_CONNECTION_BROKER] = ConnectionBroker()
+    return broker
+
+
+class _Source:
+    __slots__ = ("limit", "active", "queue", "admitted", "wait_total", "wait_max")
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.queue = []
+        self.admitted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class ConnectionTicket:
+    """A place in the queue of one source. Use as ``async with ticket:``."""
+
+    __slots__ = ("_broker", "source", "priority", "seq", "enqueued", "_future", "_held")
+
+    def __init__(self, broker, source, priority, seq):
+        self._broker = broker
+        self.source = source
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = 0.0
+        self._future = None
+        self._held = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def promote(self, priority=PRIORITY_INTERACTIVE):
+        """Move a waiting ticket ahead, e.g. when a user is waiting on it."""
+        if priority < self.priority:
+            self.priority = priority
+            self._broker._requeue(self.source)
+
+    async def __aenter__(self):
+        self._future = asyncio.get_running_loop().create_future()
+        self.enqueued = time.monotonic()
+        self._broker._enqueue(self)
+        try:
+            await self._future
+        except asyncio.CancelledError:
+            if self._future.done() and not self._future.cancelled():
+                self._broker._release(self)
+            else:
+                self._future.cancel()
+            raise
+        self._held = True
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._held:
+            self._held = False
+            self._broker._release(self)
+
+
+class ConnectionBroker:
+    def __init__(self, concurrent_connects: int = DEFAULT_CONCURRENT_CONNECTS):
+        self.concurrent_connects = concurrent_connects
+        self._sources = {}
+        self._seq = itertools.count()
+
+    def ticket(self, source=None, priority=PRIORITY_BACKGROUND) -> ConnectionTicket:
+        return ConnectionTicket(self, source or DEFAULT_SOURCE, priority, next(self._seq))
+
+    def _source(self, name) -> _Source:
+        source = self._sources.get(name)
+        if source is None:
+            source = self._sources[name] = _Source(self.concurrent_connects)
+        return source
+
+    def _enqueue(self, ticket: ConnectionTicket):
+        source = self._source(ticket.source)
+        heapq.heappush(source.queue, ticket)
+        self._dispatch(source)
+
+    def _requeue(self, name):
+        source = self._sources.get(name)
+        if source is not None:
+            heapq.heapify(source.queue)
+
+    def _release(self, ticket: ConnectionTicket):
+        source = self._source(ticket.source)
+        source.active -= 1
+        self._dispatch(source)
+
+    def _dispatch(self, source: _Source):
+        while source.active < source.limit and source.queue:
+            ticket = heapq.heappop(source.queue)
+            if ticket._future.done():
+                # Cancelled while waiting.
+                continue
+            waited = time.monotonic() - ticket.enqueued
+            source.active += 1
+            source.admitted += 1
+            source.wait_total += waited
+            source.wait_max = max(source.wait_max, waited)
+            ticket._future.set_result(None)
+
+    def free_slots(self, name) -> int:
+        """Connection attempts the broker would admit right now through ``name``."""
+        source = self._sources.get(name or DEFAULT_SOURCE)
+        if source is None:
+            return self.concurrent_connects
+        return max(0, source.limit - source.active)
+
+    def queue_depth(self, name=None) -> int:
+        """Number of attempts waiting for a slot, for one source or all of them."""
+        if name is None:
+            sources = self._sources.values()
+        else:
+            sources = [self._sources[name]] if name in self._sources else []
+        return sum(1 for source in sources for ticket in source.queue if not ticket._future.done())
+
+    def metrics(self) -> dict:
+        return {
+            name: {
+                "limit": source.limit,
+                "active": source.active,
+                "queued": self.queue_depth(name),
+                "admitted": source.admitted,
+                "wait_avg": source.wait_total / source.admitted if source.admitted else 0.0,
+                "wait_max": source.wait_max,
+            }
+            for name, source in self._sources.items()
+        }
@@ -2,3 +2,27 @@ DOMAIN = "jpoyson_aroma_diffuser"
 DEVICE_ID = "device_id"
 WORKING_TIME = "working_time"
 PAUSE_TIME = "pause_time"
+WRITE_WITHOUT_RESPONSE = "write_without_response"
+CONNECTION_MODE = "connection_mode"
+CONNECTION_MODE_PERSISTENT = "persistent"
+CONNECTION_MODE_ON_DEMAND = "on_demand"
+IDLE_TIMEOUT = "idle_timeout"
+DEFAULT_IDLE_TIMEOUT = 30
+PROGRAM = "program"
+CLOCK_SYNC_INTERVAL = "clock_sync_interval"
+DEFAULT_CLOCK_SYNC_INTERVAL = 24  # Hours
+
+# Bit of each day in a timer slot's weekday mask, matching the clock frame's 1 (Monday) to 7 (Sunday)
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+ALL_WEEK = 255  # What the vendor app sends for a slot that runs every day
+
+# GATT service that carries the diffuser's notify and write characteristics. Only the
+# characteristics (...cb8 notify, ...cba write) are known from the device; the service UUID is
+# inferred from them and not confirmed from a capture, so discovery must not rely on it alone.
+SERVICE_UUID = "0783b03e-8535-b5a0-7140-a304d2495cb7"
+
+DATA_CONNECTION_BROKER = f"{DOMAIN}_connection_broker"
+DATA_STATE_STORE = f"{DOMAIN}_state_store"
+DATA_PROGRAM_ENGINE = f"{DOMAIN}_program_engine"
+DATA_PATH_SCORES = f"{DOMAIN}_path_scores"
+DATA_CLOCK_SYNC = f"{DOMAIN}_clock_sync"
@@ -1,35 +1,89 @@
 import asyncio
 import logging
-from datetime import datetime
+import time
 
-from bleak import BleakClient
-from bleak_retry_connector import establish_connection
-from homeassistant.components import bluetooth
 from homeassistant.config_entries import ConfigEntry
-
-from custom_components.jpoyson_aroma_diffuser import WORKING_TIME, PAUSE_TIME
+from homeassistant.helpers.importlib import async_import_module
+from homeassistant.util import dt as dt_util
+
+from . import codec
+from .clock_sync import get_clock_sync, utc_offset
+from .connection_broker import get_connection_broker, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from .command_queue import CommandQueue, PRIORITY_POWER, PRIORITY_CLOCK, PRIORITY_QUERY
+from .const import (
+    DEVICE_ID, WRITE_WITHOUT_RESPONSE, CONNECTION_MODE, CONNECTION_MODE_ON_DEMAND, CONNECTION_MODE_PERSISTENT,
+    IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT, PROGRAM, WORKING_TIME, PAUSE_TIME, CLOCK_SYNC_INTERVAL,
+    DEFAULT_CLOCK_SYNC_INTERVAL,
+)
+from .frame_reader import FrameReader
+from .frame_trace import FrameTrace, RX, TX
+from .handshake import ConnectionState, SlotWaiters
+from .program_engine import get_program_engine, parse_program
+from .path_scores import PathCandidate, get_path_scores
+from .reconnect import ReconnectSupervisor
+from .state_store import get_state_store
+from .telemetry import DeviceTelemetry
 
 NOTIFICATION_CHARACTERISTIC_UUID = "0783B03E-8535-B5A0-7140-A304D2495CB8"
 SERVICE_CHARACTERISTIC_UUID = "0783B03E-8535-B5A0-7140-A304D2495CBA"
 
+HANDSHAKE_STEP_TIMEOUT = 2.0  # Seconds to wait for the A5FB replies of one query round
+HANDSHAKE_RETRIES = 3  # Query rounds before giving up on slots that did not answer
+COMMAND_CONNECT_TIMEOUT = 20.0  # Seconds a service call waits for an in-flight reconnect
+EXPECTATION_TIMEOUT = 2.0  # Seconds to wait for the A5FB echo of a command before querying its slot
+MAX_PATHS_PER_ATTEMPT = 2  # Scanners tried, best first, before a connection attempt counts as failed
+
 
 class DeviceManager:
-    def __init__(self, hass, config_entry: ConfigEntry):
+    def __init__(self, hass, config_entry: ConfigEntry, transport=None):
         self.hass = hass
         self.config_entry = config_entry
+        self.transport = transport  # Loaded on the first connection attempt unless given
 
         self.client = None
-        self.device_id = None
-        self.sendDateTimeCount = 0
-        self.sendClockInterval = None
-        self.reconnect_attempts = 0
-        self.max_reconnect_attempts = 10  # Maximum reconnect attempts
+        self.device_id = config_entry.data.get(DEVICE_ID)
+        self.state = ConnectionState.DISCONNECTED
+        self._state_since = time.monotonic()
+        self.handshake_timings = {}  # Seconds spent in each handshake phase of the last connect
+        self._listeners = []
+        self._reported_available = False
+        self._slot_waiters = SlotWaiters()
+        self.connection_broker = get_connection_broker(hass)
+        self.path_scores = get_path_scores(hass)
+        self._connect_ticket = None
+        self._interactive_waiters = 0
+        self.reconnect_supervisor = ReconnectSupervisor(
+            f"Device {self.device_id}", lambda: self.connect_device(self.device_id), self._create_background_task,
+            on_circuit_change=self.async_update_listeners)
         self.logger = logging.getLogger(__package__)
-        self.state_object_array = [None] * 4  # Assuming 4 timer slots as per the JS code
+        self.state_object_array = [None] * codec.TIMER_SLOTS  # Latest codec.TimerSlot reported for each slot
+        self._slot_listeners = [[] for _ in range(codec.TIMER_SLOTS)]
         self.power_status = False
         self.power_status_callback = None
-
-        self.logger.info(f'DeviceManager initialized')
+        # Whether power and each slot were last reported by the device, rather than restored or assumed
+        self.power_confirmed = False
+        self.slot_confirmed = [False] * codec.TIMER_SLOTS
+        self.frame_reader = FrameReader()
+        self.frame_trace = FrameTrace()
+        self.command_queue = CommandQueue(self._write_frame)
+        self.supports_write_without_response = False
+        self.synced = False  # A full handshake has completed at least once
+        self.restored = False  # Power and slot state were restored from the state store
+        self.state_store = get_state_store(hass)
+        self._restored_fresh = False
+        self._ble_device = None
+        self._path_source = None  # Scanner of the current connection
+        self._idle_handle = None
+        self._commands_in_flight = 0
+        self.telemetry = DeviceTelemetry()
+        self._disconnected_at = None
+        self.program_engine = get_program_engine(hass)
+        self.clock_sync = get_clock_sync(hass)
+        self.clock_synced_at = None  # Wall-clock time of the last clock frame
+        self.clock_synced_offset = None  # UTC offset in seconds that clock frame was sent under
+        self._program_params = None  # (power, working, pause) of the program step last sent
+
+        self.logger.debug("DeviceManager initialized for %s", self.device_id)
 
     @property
     def working_time(self):
@@ -39,195 +93,607 @@ class DeviceManager:
     def pause_time(self):
         return self.config_entry.options.get(PAUSE_TIME, 180)
 
-    def get_control_code(self, timer_mode, power_status, current_time_type):
-        control_code = [165, 250, power_status, timer_mode['week'], current_time_type]
-        start_hour = int(timer_mode['startTimeHour'])
-        stop_hour = int(timer_mode['stopTimeHour'])
-        start_min = int(timer_mode['startTimeMin'])
-        stop_min = int(timer_mode['stopTimeMin'])
-        working_time = timer_mode['workingTime']
-        pause_time = timer_mode['pauseTime']
-        working_time_int = int(working_time)
-        pause_time_int = int(pause_time)
-
-        control_code.extend(
-            [start_hour, start_min, stop_hour, stop_min, (working_time_int & 65280) >> 8, working_time_int & 255,
-             (pause_time_int & 65280) >> 8, pause_time_int & 255])
+    @property
+    def program(self):
+        """Steps of the scent program stored in the options, sorted by time of day."""
+        return parse_program(self.config_entry.options.get(PROGRAM))
 
-        checksum = sum(control_code)
-        control_code.append(checksum & 255)
+    @property
+    def clock_sync_interval(self):
+        """Seconds after which the device clock is synced again."""
+        return self.config_entry.options.get(CLOCK_SYNC_INTERVAL, DEFAULT_CLOCK_SYNC_INTERVAL) * 3600
 
-        control_code_bytes = bytearray(control_code)
+    @property
+    def ready(self):
+        return self.state is ConnectionState.READY
 
-        return control_code_bytes
+    @property
+    def on_demand(self):
+        return self.config_entry.options.get(CONNECTION_MODE, CONNECTION_MODE_PERSISTENT) == CONNECTION_MODE_ON_DEMAND
 
-    def get_clock_code(self):
-        current_time = datetime.now()
-        hour = current_time.hour
-        minute = current_time.minute
-        second = current_time.second
-        weekday = current_time.weekday() + 1  # Python's weekday starts from 0 (Monday) to 6 (Sunday)
+    @property
+    def idle_timeout(self):
+        return self.config_entry.options.get(IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT)
 
-        clock_code = []
-        clock_code.extend([165, 253, weekday, hour, minute, second, 0, 0, 0, 0, 0, 0])
+    @property
+    def available(self):
+        """True once the device is connected and the post-connect handshake has completed.
+
+        In on-demand mode the link is expected to be down between commands, so
+        the device stays available once its state is known, unless connecting
+        keeps failing. A state restored from the store is shown, unconfirmed,
+        until the first handshake in either mode. Once the circuit breaker has
+        opened, the device stays unavailable until a connection succeeds, so
+        it does not flap with every cooldown.
+        """
+        if self.reconnect_supervisor.tripped:
+            return False
+        if self.on_demand:
+            return self.synced or self.restored
+        return (self.ready and self.connected) or (self.restored and not self.synced)
+
+    def add_listener(self, listener):
+        """Register a callback invoked when availability changes. Returns a remove function."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def async_update_listeners(self):
+        """Notify listeners if availability changed since the last call."""
+        available = self.available
+        if available == self._reported_available:
+            return
+        self._reported_available = available
+        for listener in list(self._listeners):
+            listener()
+
+    def _set_state(self, state: ConnectionState):
+        if self.state is state:
+            return
+        now = time.monotonic()
+        previous = self.state
+        if previous in (ConnectionState.SUBSCRIBING, ConnectionState.CLOCK_SYNC, ConnectionState.QUERYING):
+            self.handshake_timings[previous.value] = now - self._state_since
+        self.state = state
+        self._state_since = now
+        self.logger.debug("Device %s: %s -> %s", self.device_id, previous.value, state.value)
+
+        if state is ConnectionState.DISCONNECTED:
+            self._slot_waiters.cancel_all()
+        if state is ConnectionState.READY:
+            self.synced = True
+        self.async_update_listeners()
 
-        checksum = sum(clock_code)
-        clock_code.append(checksum & 255)
+    @property
+    def write_without_response(self):
+        """Whether idempotent frames (clock, query) may skip the write response."""
+        return self.config_entry.options.get(WRITE_WITHOUT_RESPONSE, False) and self.supports_write_without_response
+
+    def _create_background_task(self, target, name):
+        return self.config_entry.async_create_background_task(self.hass, target, f"{self.device_id} {name}")
+
+    def restore_state(self):
+        """Load the last known power and slot state so entities start out with real values."""
+        state = self.state_store.get(self.device_id)
+        if state is None:
+            return
+        self.power_status = bool(state["power"])
+        self.state_object_array = [codec.TimerSlot(*slot) if slot else None for slot in state["slots"]]
+        self.clock_synced_at = state.get("clock_synced_at")
+        self.clock_synced_offset = state.get("clock_synced_offset")
+        self.restored = True
+        self._restored_fresh = self.state_store.is_fresh(state)
+        self.logger.debug("Device %s restored state (fresh: %s)", self.device_id, self._restored_fresh)
+
+    def _save_state(self):
+        self.state_store.update(self.device_id, self.power_status, self.state_object_array,
+                                clock_synced_at=self.clock_synced_at, clock_synced_offset=self.clock_synced_offset)
+
+    def async_start(self):
+        """Start connecting in the background."""
+        self.reconnect_supervisor.request()
+        self.clock_sync.add(self)
+        self.set_program(self.program)
+
+    def apply_connection_mode(self):
+        """Follow a changed connection mode option: reconnect when persistent, idle out when on-demand."""
+        if self.on_demand:
+            self._schedule_idle_disconnect()
+        else:
+            self._cancel_idle_disconnect()
+            if not (self.ready and self.connected):
+                self.reconnect_supervisor.request()
+        self.async_update_listeners()
+
+    def set_program(self, steps):
+        """Run a scent program, or stop the current one when ``steps`` is empty."""
+        self._program_params = None
+        self.program_engine.set_program(self, steps)
+
+    def apply_program_step(self, step):
+        """Switch to a program step unless its power, working and pause times are already in effect."""
+        params = (step.power, step.working_time, step.pause_time)
+        if params == self._program_params:
+            return
+        self._program_params = params
+        self._create_background_task(self._async_apply_program_step(params), "program step")
+
+    async def _async_apply_program_step(self, params):
+        power, working_time, pause_time = params
+
+        def in_effect():
+            return (self.power_confirmed and self.slot_confirmed[0] and self.power_status == power
+                    and self.state_object_array[0] == self._all_day_slot(working_time, pause_time))
+
+        async def apply():
+            # Checked after connecting, once the handshake has confirmed the device's state.
+            if not in_effect():
+                await self._set_power(power, working_time, pause_time)
+
+        if in_effect():
+            return
+        try:
+            # Programs run unattended, so they must not jump ahead of commands a user is waiting for.
+            applied = await self.async_run_command(apply, interactive=False)
+        except ConnectionError as e:
+            self.logger.debug("Program step for %s failed: %s", self.device_id, e)
+            applied = False
+        if not applied and self._program_params == params:
+            # Sent again by the program engine once the device is back.
+            self._program_params = None
+
+    async def async_ensure_connected(self, timeout=COMMAND_CONNECT_TIMEOUT, interactive=True):
+        """Wait for the device to become available, joining any in-flight reconnect.
+
+        With ``interactive`` a user is waiting, so a queued connection attempt
+        jumps ahead of background reconnects.
+        """
+        if self.ready and self.connected:
+            return True
+        if not interactive:
+            return await self.reconnect_supervisor.wait(timeout)
+        self._interactive_waiters += 1
+        if self._connect_ticket is not None:
+            self._connect_ticket.promote(PRIORITY_INTERACTIVE)
+        try:
+            return await self.reconnect_supervisor.wait(timeout)
+        finally:
+            self._interactive_waiters -= 1
+
+    async def async_run_command(self, command, interactive=True) -> bool:
+        """Run ``command`` once the device is connected, connecting on demand.
+
+        Returns False if no connection could be established. Unattended
+        callers pass ``interactive=False`` to connect at background priority.
+        The latency of each command is recorded separately for warm and cold
+        links.
+        """
+        started = time.monotonic()
+        path = "warm" if self.ready and self.connected else "cold"
+        self._cancel_idle_disconnect()
+        self._commands_in_flight += 1
+        try:
+            if not await self.async_ensure_connected(interactive=interactive):
+                return False
+            await command()
+        finally:
+            self._commands_in_flight -= 1
+            self._schedule_idle_disconnect()
+
+        latency = time.monotonic() - started
+        self.telemetry.command_latency[path].record(latency)
+        self.logger.debug("Device %s %s command took %.3fs", self.device_id, path, latency)
+        return True
+
+    def _cancel_idle_disconnect(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _schedule_idle_disconnect(self):
+        """In on-demand mode, drop the link once it has been idle for ``idle_timeout`` seconds."""
+        self._cancel_idle_disconnect()
+        if self.on_demand and self.client is not None and not self._commands_in_flight:
+            self._idle_handle = self.hass.loop.call_later(self.idle_timeout, self._idle_timeout_expired)
+
+    def _idle_timeout_expired(self):
+        self._idle_handle = None
+        if self._commands_in_flight or len(self.command_queue) or not self.ready:
+            self._schedule_idle_disconnect()
+            return
+        self._create_background_task(self.async_disconnect(), "idle disconnect")
+
+    async def async_disconnect(self):
+        """Close the link on purpose, without triggering a reconnect."""
+        self._cancel_idle_disconnect()
+        client, self.client = self.client, None
+        self._set_state(ConnectionState.DISCONNECTED)
+        if client is not None and client.is_connected:
+            self.logger.debug("Disconnecting idle device %s", self.device_id)
+            await client.disconnect()
 
-        clock_code_bytes = bytearray(clock_code)
+    def get_control_code(self, timer_mode, power_status, current_time_type):
+        return codec.encode_control(
+            power_status, timer_mode['week'], current_time_type,
+            int(timer_mode['startTimeHour']), int(timer_mode['startTimeMin']),
+            int(timer_mode['stopTimeHour']), int(timer_mode['stopTimeMin']),
+            int(timer_mode['workingTime']), int(timer_mode['pauseTime']))
 
-        return clock_code_bytes
+    def get_clock_code(self):
+        # Home Assistant's time zone, which may differ from the host's
+        current_time = dt_util.now()
+        # Python's weekday starts from 0 (Monday) to 6 (Sunday)
+        return codec.encode_clock(current_time.weekday() + 1, current_time.hour, current_time.minute,
+                                  current_time.second)
 
     def get_query_code(self, time_slot):
-        query_code = [165, 252, time_slot, 0, 0, 0]
-        checksum = sum(query_code)
-        query_code.append(checksum & 255)
-
-        query_code_bytes = bytearray(query_code)
-        return query_code_bytes
+        return codec.encode_query(time_slot)
 
     async def turn_off_device(self):
-        control_code = self.get_control_code({
-            "week": 255,  # 255 represents all days of the week 11111111
-            "startTimeHour": "00",
-            "startTimeMin": "00",
-            "stopTimeHour": "23",
-            "stopTimeMin": "59",
-            "workingTime": self.working_time,
-            "pauseTime": self.pause_time,
-        }, 0, 1)
-        await self.send_control_code(control_code)
-        self.logger.info(f"Device turned off, working time: {self.working_time}, pause time: {self.pause_time}")
+        return await self._set_power(False)
 
     async def turn_on_device(self):
+        return await self._set_power(True)
+
+    @staticmethod
+    def _all_day_slot(working_time, pause_time):
+        return codec.TimerSlot(255, 0, 0, 23, 59, working_time, pause_time)
+
+    async def _set_power(self, power: bool, working_time=None, pause_time=None) -> bool:
+        """Write the all-week slot 1 frame with ``power`` and wait for the device to confirm it.
+
+        Working and pause times default to the configured options. Returns
+        True once an A5FB reply shows the new power state. If the device
+        never answers, the requested state is kept as assumed.
+        """
         control_code = self.get_control_code({
             "week": 255,  # 255 represents all days of the week 11111111
             "startTimeHour": "00",
             "startTimeMin": "00",
             "stopTimeHour": "23",
             "stopTimeMin": "59",
-            "workingTime": self.working_time,
-            "pauseTime": self.pause_time,
-        }, 1, 1)
-        await self.send_control_code(control_code)
-        self.logger.info(f"Device turned on, working time: {self.working_time}, pause time: {self.pause_time}")
+            "workingTime": self.working_time if working_time is None else working_time,
+            "pauseTime": self.pause_time if pause_time is None else pause_time,
+        }, int(power), 1)
+        reply = await self._expect_slot(1, lambda: self.send_control_code(control_code, key="power"),
+                                        lambda frame: frame.power == power)
+        if reply is None:
+            self.logger.warning(f"Device {self.device_id} did not confirm power {'on' if power else 'off'}")
+            self._assume_power(power)
+            return False
+        if reply.power != power:
+            self.logger.warning(f"Device {self.device_id} reports power {'on' if reply.power else 'off'} "
+                                f"after it was switched {'on' if power else 'off'}")
+            return False
+        self.logger.debug("Device %s turned %s, working time: %s, pause time: %s",
+                          self.device_id, "on" if power else "off", self.working_time, self.pause_time)
+        return True
+
+    async def _expect_slot(self, slot, send, accept, timeout=EXPECTATION_TIMEOUT):
+        """Run ``send`` and wait for an A5FB reply of ``slot`` that satisfies ``accept``.
+
+        Without a matching reply in time the slot is queried once, instead of
+        sweeping all slots. Returns the last reply, or None if none arrived.
+        """
+        reply = None
+        for step in (send, lambda: self.send_query_code(slot)):
+            waiter = self._slot_waiters.wait(slot)
+            try:
+                await step()
+                reply = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            except asyncio.TimeoutError:
+                continue
+            except asyncio.CancelledError:
+                # Waiters are cancelled when the link drops.
+                if waiter.cancelled():
+                    raise ConnectionError(f"Device {self.device_id} disconnected") from None
+                raise
+            finally:
+                self._slot_waiters.discard(slot, waiter)
+                waiter.cancel()
+            if accept(reply):
+                break
+        return reply
+
+    def _assume_power(self, power: bool):
+        """Keep a power state the device has not confirmed, marked as assumed."""
+        changed = power != self.power_status or self.power_confirmed
+        self.power_status = power
+        self.power_confirmed = False
+        if changed and self.power_status_callback:
+            self.power_status_callback(self.power_status)
 
     async def connect_device(self, device_id):
-        """Connect to the BLE device using Home Assistant's bluetooth integration."""
+        """Connect to the BLE device through the transport, by default Home Assistant's bluetooth integration."""
         self.device_id = device_id
         
-        async def handle_disconnect(client: BleakClient):
+        def handle_disconnect(client):
+            if client is not self.client:
+                return
             self.logger.warning(f"Device {self.device_id} disconnected")
+            self.telemetry.disconnects += 1
+            self._disconnected_at = time.monotonic()
             self.client = None  # Clear the client reference
-            await self.try_reconnect()
+            self._set_state(ConnectionState.DISCONNECTED)
+            self.command_queue.clear(ConnectionError(f"Device {self.device_id} disconnected"))
+            self._cancel_idle_disconnect()
+            if not self.on_demand:
+                self.reconnect_supervisor.request(self.reconnect_supervisor.base_delay)
 
+        self._set_state(ConnectionState.CONNECTING)
         try:
-            # Use Home Assistant's bluetooth integration for device connection
-            ble_device = bluetooth.async_ble_device_from_address(
-                self.hass, device_id.upper(), connectable=True
-            )
-            if not ble_device:
+            await self._async_get_transport()
+            paths = self._ranked_paths()
+            if not paths:
                 self.logger.error(f"Could not find BLE device {device_id}")
+                self._set_state(ConnectionState.DISCONNECTED)
                 return False
 
-            # Use bleak-retry-connector for more reliable connections
-            client = await establish_connection(
-                BleakClient,
-                ble_device,
-                name=device_id,
-                disconnected_callback=handle_disconnect,
-                timeout=10.0,  # 10 second timeout as recommended
-                max_attempts=3
-            )
-            
-            return await self.try_connect(client)
+            # Best path first; a path that fails hands over to the next one.
+            for path in paths[:MAX_PATHS_PER_ATTEMPT]:
+                if await self._connect_path(path, handle_disconnect):
+                    return True
+                self._set_state(ConnectionState.CONNECTING)
+            self._set_state(ConnectionState.DISCONNECTED)
+            return False
         except Exception as e:
+            self.telemetry.connect_failures += 1
             self.logger.error(f"Failed to establish connection: {e}")
+            self._set_state(ConnectionState.DISCONNECTED)
             return False
 
+    def _ranked_paths(self):
+        """Scanners that can reach the device, best first."""
+        candidates = self.transport.candidates(self.device_id)
+        if not candidates:
+            # Fall back to the last seen BLEDevice so a cold on-demand command
+            # does not have to wait for a fresh advertisement.
+            ble_device = self._get_ble_device()
+            if not ble_device:
+                return []
+            candidates = [PathCandidate(ble_device, self.transport.source(ble_device), None, None)]
+        candidates = [
+            candidate._replace(free_slots=min(
+                self.connection_broker.free_slots(candidate.source),
+                self.connection_broker.concurrent_connects if candidate.free_slots is None else candidate.free_slots,
+            ))
+            for candidate in candidates
+        ]
+        return self.path_scores.rank(self.device_id, candidates)
+
+    async def _connect_path(self, path, handle_disconnect):
+        """Connect and hand shake through one scanner, recording the outcome for its score."""
+        self._ble_device = path.ble_device
+        self._path_source = path.source
+        self.telemetry.source = path.source
+        if path.rssi is not None:
+            self.telemetry.rssi = path.rssi
+
+        def ble_device_callback():
+            # Retries stay on this scanner, with its freshest BLEDevice.
+            for candidate in self.transport.candidates(self.device_id):
+                if candidate.source == path.source:
+                    return candidate.ble_device
+            return path.ble_device
+
+        priority = PRIORITY_INTERACTIVE if self._interactive_waiters else PRIORITY_BACKGROUND
+        self._connect_ticket = self.connection_broker.ticket(path.source, priority)
+        try:
+            # Wait for a free connection slot on the adapter or proxy
+            async with self._connect_ticket:
+                started = time.monotonic()
+                try:
+                    client = await self.transport.connect(path.ble_device, self.device_id, handle_disconnect,
+                                                          ble_device_callback)
+                except Exception as e:
+                    self.telemetry.connect_failures += 1
+                    self.path_scores.record_connect(self.device_id, path.source, None)
+                    self.logger.warning(f"Failed to connect to {self.device_id} through {path.source}: {e}")
+                    return False
+                connect_latency = time.monotonic() - started
+                connected = await self.try_connect(client)
+                self.path_scores.record_connect(self.device_id, path.source, connect_latency if connected else None)
+                return connected
+        finally:
+            self._connect_ticket = None
+
+    async def _async_get_transport(self):
+        """Return the transport, importing the Bluetooth one on first use so bleak stays off the import path."""
+        if self.transport is None:
+            module = await async_import_module(self.hass, f"{__package__}.transport")
+            self.transport = module.BleakTransport(self.hass)
+        return self.transport
+
+    def _get_ble_device(self):
+        return self.transport.find_device(self.device_id) or self._ble_device
+
     async def try_connect(self, client):
         """Initialize connection and setup device communication."""
         try:
             # Client is already connected by bleak-retry-connector
             self.logger.info(f"Connected to {self.device_id}")
             self.client = client
-            self.reconnect_attempts = 0  # Reset reconnect attempts after successful connection
 
-            await self.enable_notifications(NOTIFICATION_CHARACTERISTIC_UUID)
-
-            await self.send_control_code(self.get_clock_code())
-            self.sendDateTimeCount += 1
-            self.sendClockInterval = asyncio.get_event_loop().call_later(0.1, self.send_clock_code_repeatedly)
+            await self.async_handshake()
             return True
         except Exception as e:
             self.logger.error(f"Failed to initialize connection: {e}")
+            self.client = None
+            self._set_state(ConnectionState.DISCONNECTED)
             if client and client.is_connected:
                 await client.disconnect()
-            return await self.try_reconnect()
-
-    async def try_reconnect(self):
-        """Attempt to reconnect with exponential backoff."""
-        if self.reconnect_attempts < self.max_reconnect_attempts:
-            self.reconnect_attempts += 1
-            # Exponential backoff: 2, 4, 8, 16, 32... seconds (max 60)
-            delay = min(2 ** self.reconnect_attempts, 60)
-            self.logger.info(f"Reconnecting attempt {self.reconnect_attempts}/{self.max_reconnect_attempts} in {delay}s...")
-            await asyncio.sleep(delay)
-            return await self.connect_device(self.device_id)
-        else:
-            self.logger.error("Max reconnect attempts reached. Giving up.")
-            self.reconnect_attempts = 0
+            return False
 
-        return False
+    async def async_handshake(self):
+        """Bring a freshly connected device to READY.
+
+        Each phase advances as soon as the device has answered instead of
+        waiting on fixed timers; only query rounds that time out are retried.
+        """
+        self.handshake_timings = {}
+        started = time.monotonic()
+
+        self._set_state(ConnectionState.SUBSCRIBING)
+        await self.enable_notifications(NOTIFICATION_CHARACTERISTIC_UUID)
+        characteristic = self.client.services.get_characteristic(SERVICE_CHARACTERISTIC_UUID)
+        self.supports_write_without_response = bool(
+            characteristic and "write-without-response" in characteristic.properties)
+
+        # The device keeps its clock across connections, so a reconnect only
+        # syncs it when the last sync is stale.
+        if self.clock_sync.is_stale(self):
+            self._set_state(ConnectionState.CLOCK_SYNC)
+            await self.sync_clock()
+
+        # An on-demand link that reconnects for a command already knows the
+        # slot state from an earlier session, so it skips straight to READY.
+        if not (self.on_demand and self.synced):
+            self._set_state(ConnectionState.QUERYING)
+            # Every A5FB frame carries the power state, so with a recently
+            # saved slot state a single query is enough to confirm it.
+            if self._restored_fresh and None not in self.state_object_array:
+                slots = [1]
+            else:
+                slots = range(1, codec.TIMER_SLOTS + 1)
+            self._restored_fresh = False
+            missing = await self.query_slots(slots)
+            if len(missing) == len(slots):
+                # Writes went through but nothing came back, so the link is not usable; let the supervisor retry.
+                raise ConnectionError(f"Device {self.device_id} did not answer any query")
+            if missing:
+                self.logger.warning(f"Device {self.device_id} did not report timer slots {sorted(missing)}")
+
+        self._set_state(ConnectionState.READY)
+        self._schedule_idle_disconnect()
+        self.handshake_timings["total"] = time.monotonic() - started
+        self.telemetry.connects += 1
+        self.telemetry.handshake.record(self.handshake_timings["total"])
+        if self._disconnected_at is not None:
+            self.telemetry.reconnects += 1
+            self.telemetry.time_to_reconnect.record(time.monotonic() - self._disconnected_at)
+            self._disconnected_at = None
+        self.logger.debug("Device %s handshake timings: %s", self.device_id, self.handshake_timings)
+        self.program_engine.refresh(self)
+
+    async def query_slots(self, slots, timeout=HANDSHAKE_STEP_TIMEOUT, retries=HANDSHAKE_RETRIES):
+        """Query timer slots and wait for their A5FB replies. Returns the slots that never answered."""
+        async def send(pending):
+            for slot in pending:
+                await self.send_query_code(slot)
+
+        return await self._confirm_slots(slots, send, timeout, retries)
+
+    async def write_slots(self, timers, timeout=HANDSHAKE_STEP_TIMEOUT, retries=HANDSHAKE_RETRIES):
+        """Write ``{slot: codec.TimerSlot}`` as one queued batch of control frames.
+
+        A slot counts as written once the device echoes it back in an A5FB
+        frame; slots whose echo is missing or differs are rewritten. Returns
+        the slots that were never confirmed.
+        """
+        power = int(self.power_status)
+
+        async def send(pending):
+            await self.command_queue.submit_many(
+                [(f"slot_{slot}", codec.encode_control(power, timers[slot].week, slot, *timers[slot][1:]))
+                 for slot in pending])
+
+        return await self._confirm_slots(timers, send, timeout, retries,
+                                         lambda slot, frame: frame.timer == timers[slot])
+
+    async def _confirm_slots(self, slots, send, timeout, retries, accept=None):
+        """Call ``send`` with the slots still missing until each has an accepted A5FB reply."""
+        missing = set(slots)
+        for _ in range(retries):
+            if not missing:
+                break
+            waiters = {slot: self._slot_waiters.wait(slot) for slot in missing}
+            try:
+                await send(sorted(missing))
+                await asyncio.wait(waiters.values(), timeout=timeout)
+            finally:
+                for slot, future in waiters.items():
+                    if future.done() and not future.cancelled():
+                        if accept is None or accept(slot, future.result()):
+                            missing.discard(slot)
+                    else:
+                        self._slot_waiters.discard(slot, future)
+                        future.cancel()
+        return missing
+
+    async def async_set_schedule(self, timers):
+        """Apply ``{slot: codec.TimerSlot}``, writing only the slots that differ from the cached state.
+
+        A slot the device has not confirmed in this session, e.g. one restored
+        from the store, always counts as changed. Returns ``(changed,
+        unconfirmed)`` slot lists. Raises ConnectionError if the device cannot
+        be reached.
+        """
+        def differs():
+            return {slot: timer for slot, timer in timers.items()
+                    if not self.slot_confirmed[slot - 1] or self.state_object_array[slot - 1] != timer}
+
+        if not differs():
+            return [], []
+
+        changed, unconfirmed = {}, set()
+
+        async def write():
+            nonlocal changed, unconfirmed
+            # The handshake may just have confirmed some slots.
+            changed = differs()
+            if changed:
+                unconfirmed = await self.write_slots(changed)
+
+        if not await self.async_run_command(write):
+            raise ConnectionError(f"Device {self.device_id} is not reachable")
+        if unconfirmed:
+            self.logger.warning(f"Device {self.device_id} did not confirm timer slots {sorted(unconfirmed)}")
+        return sorted(changed), sorted(unconfirmed)
 
     async def enable_notifications(self, characteristic_uuid):
         def notification_handler(sender, data):
-            # 將 bytearray 轉換為十六進制字串
-            hex_data = data.hex().upper()
-            self.logger.info(f"Notification from {sender}: {hex_data}")
+            self.frame_trace.record(RX, data)
+            self.telemetry.notifications.tick(time.monotonic())
 
-            if hex_data.startswith("A5FB"):
-                self.set_device_state(hex_data)
+            for frame in self.frame_reader.feed(data):
+                if type(frame) is codec.SlotFrame and frame.frame_type == codec.FRAME_STATUS:
+                    self.set_device_state(frame)
 
+        self.frame_reader.reset()
+        await self.client.start_notify(characteristic_uuid, notification_handler)
+        self.logger.debug("Notifications enabled for %s", self.device_id)
+
+    def set_device_state(self, frame: codec.SlotFrame):
+        """Apply an A5FB status frame, notifying listeners only about values that changed."""
+        self._slot_waiters.resolve(frame.slot, frame)
+
+        if frame.power != self.power_status or not self.power_confirmed:
+            if frame.power != self.power_status:
+                self.power_status = frame.power
+                self.logger.debug("Device %s power status: %s", self.device_id, self.power_status)
+                self._save_state()
+            self.power_confirmed = True
             if self.power_status_callback:
                 self.power_status_callback(self.power_status)
-                self.logger.info(f"Callback called with power status: {self.power_status}")
 
-        await self.client.start_notify(characteristic_uuid, notification_handler)
-        self.logger.info('Notifications enabled')
-
-    def set_device_state(self, hex_data):
-        # 解析資料
-        power_status = int(hex_data[4:6], 16)
-        week = int(hex_data[6:8], 16)
-        timer_slot = int(hex_data[8:10], 16) - 1
-        start_time_hour = int(hex_data[10:12], 16)
-        start_time_min = int(hex_data[12:14], 16)
-        stop_time_hour = int(hex_data[14:16], 16)
-        stop_time_min = int(hex_data[16:18], 16)
-        working_time = int(hex_data[18:22], 16)
-        pause_time = int(hex_data[22:26], 16)
-
-        self.power_status = (power_status != 0)
-        self.logger.info(f"Latest power status: {self.power_status}")
-
-        timer_object = {
-            # convert to binary, this is a bitmask. 1 = Monday, 2 = Tuesday, 4 = Wednesday, 8 = Thursday, 16 = Friday, 32 = Saturday, 64 = Sunday
-            "week": week,
-            "startTimeHour": start_time_hour,
-            "startTimeMin": start_time_min,
-            "stopTimeHour": stop_time_hour,
-            "stopTimeMin": stop_time_min,
-            "workingTime": working_time,
-            "pauseTime": pause_time,
-        }
-        try:
-            self.state_object_array[timer_slot] = timer_object
-            self.logger.info(f"Timer slot {timer_slot + 1} state updated: {timer_object}")
-            # Notify Home Assistant
-            self.hass.states.async_set(f"sensor.timer_slot_{timer_slot + 1}", timer_object)
-        except IndexError:
+        timer_slot = frame.slot - 1
+        if not 0 <= timer_slot < codec.TIMER_SLOTS:
             self.logger.error(f"Invalid timer slot {timer_slot}")
+            return
+        # TimerSlot is an immutable tuple, so an unchanged slot compares equal and is skipped.
+        if self.state_object_array[timer_slot] == frame.timer and self.slot_confirmed[timer_slot]:
+            return
+        self.slot_confirmed[timer_slot] = True
+        if self.state_object_array[timer_slot] != frame.timer:
+            self.state_object_array[timer_slot] = frame.timer
+            self._save_state()
+        self.logger.debug("Device %s timer slot %s updated: %s", self.device_id, frame.slot, frame.timer)
+        for listener in list(self._slot_listeners[timer_slot]):
+            listener()
+
+    def add_slot_listener(self, slot, listener):
+        """Register a callback for changes of a 0-based timer slot. Returns a remove function."""
+        self._slot_listeners[slot].append(listener)
+        return lambda: self._slot_listeners[slot].remove(listener)
 
     @property
     def connected(self):
@@ -235,23 +701,114 @@ class DeviceManager:
             return False
         return self.client.is_connected
 
-    def send_clock_code_repeatedly(self):
-        if self.sendDateTimeCount < 5:
-            asyncio.create_task(self.send_control_code(self.get_clock_code()))
-            self.sendDateTimeCount += 1
-            self.sendClockInterval = asyncio.get_event_loop().call_later(0.1, self.send_clock_code_repeatedly)
-        else:
-            self.sendClockInterval = None
-            asyncio.create_task(self.send_query_codes())
+    async def send_control_code(self, code, priority=PRIORITY_POWER, key=None, response=True):
+        """Queue a frame for the device and wait until it has been written."""
+        await self.command_queue.submit(code, priority, key, response)
+
+    async def send_clock_code(self):
+        await self.send_control_code(self.get_clock_code(), PRIORITY_CLOCK, "clock",
+                                     not self.write_without_response)
+
+    async def sync_clock(self):
+        """Send one clock frame and remember when and under which UTC offset it was sent."""
+        # The device does not reply to clock frames; the write itself is the acknowledgement.
+        await self.send_clock_code()
+        self.clock_synced_at = time.time()
+        self.clock_synced_offset = utc_offset()
 
-    async def send_control_code(self, code):
-        self.logger.info(f'Sending control code: {code}')
-        await self.client.write_gatt_char(SERVICE_CHARACTERISTIC_UUID, code, response=True)
+    def async_schedule_clock_sync(self):
+        """Resync the clock in the background, for the clock sync scheduler."""
+        self._create_background_task(self._async_resync_clock(), "clock sync")
+
+    async def _async_resync_clock(self):
+        if not (self.ready and self.connected):
+            return
+        try:
+            await self.sync_clock()
+        except ConnectionError as e:
+            self.logger.debug("Clock sync of %s failed: %s", self.device_id, e)
+            return
+        # During a handshake the slot status replies save the state; here nothing else will.
+        self._save_state()
+
+    async def send_query_code(self, time_slot):
+        await self.send_control_code(self.get_query_code(time_slot), PRIORITY_QUERY, f"query_{time_slot}",
+                                     not self.write_without_response)
 
     async def send_query_codes(self):
-        for i in range(1, 5):
-            await self.send_control_code(self.get_query_code(i))
-            await asyncio.sleep(0.1)
+        return await self.query_slots(range(1, codec.TIMER_SLOTS + 1))
+
+    async def _write_frame(self, code, response):
+        if not self.client:
+            raise ConnectionError(f"Device {self.device_id} is not connected")
+        self.frame_trace.record(TX, code)
+        started = time.monotonic()
+        await self.client.write_gatt_char(SERVICE_CHARACTERISTIC_UUID, code, response=response)
+        if response:
+            latency = time.monotonic() - started
+            self.telemetry.write_latency.record(latency)
+            self.path_scores.record_write(self.device_id, self._path_source, latency)
+
+    def update_link_info(self):
+        """Refresh RSSI and the adapter or proxy from the latest advertisement."""
+        if self.transport is None:
+            return
+        info = self.transport.last_service_info(self.device_id)
+        if info is not None:
+            self.telemetry.rssi = info.rssi
+            # telemetry.source stays on the connected path; scores and diagnostics depend on it.
+            self.telemetry.advertisement_source = info.source
+
+    def as_diagnostics(self):
+        return {
+            "state": self.state.value,
+            "connected": self.connected,
+            "available": self.available,
+            "power_status": self.power_status,
+            "power_confirmed": self.power_confirmed,
+            "slot_confirmed": self.slot_confirmed,
+            "timer_slots": [slot._asdict() if slot else None for slot in self.state_object_array],
+            "handshake_timings": self.handshake_timings,
+            "clock": {
+                "synced_at": self.clock_synced_at,
+                "synced_offset": self.clock_synced_offset,
+                "stale": self.clock_sync.is_stale(self),
+            },
+            "paths": self.path_scores.as_dict(self.device_id),
+            "telemetry": self.telemetry.as_dict(),
+            "frame_trace": self.frame_trace.dump(),
+            "frame_reader": {
+                "frames": self.frame_reader.frames,
+                "resyncs": self.frame_reader.resyncs,
+                "bad_checksums": self.frame_reader.bad_checksums,
+            },
+            "command_queue": {
+                "queued": len(self.command_queue),
+                "written": self.command_queue.written,
+                "coalesced": self.command_queue.coalesced,
+            },
+            "reconnect": {
+                "attempts": self.reconnect_supervisor.attempts,
+                "failures": self.reconnect_supervisor.failures,
+                "circuit_open": self.reconnect_supervisor.circuit_open,
+            },
+            "program": {
+                "steps": self.config_entry.options.get(PROGRAM, []),
+                "applied": self._program_params,
+            },
+        }
+
+    async def async_shutdown(self):
+        """Stop pending work and disconnect from the device."""
+        self.program_engine.remove(self)
+        self.clock_sync.remove(self)
+        self._cancel_idle_disconnect()
+        await self.reconnect_supervisor.stop()
+        await self.command_queue.stop()
+        self._set_state(ConnectionState.DISCONNECTED)
+        if self.client:
+            client, self.client = self.client, None
+            await client.disconnect()
 
     def set_power_status_callback(self, callback):
         self.power_status_callback = callback
@@ -0,0 +1,25 @@
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .clock_sync import get_clock_sync
+from .connection_broker import get_connection_broker
+from .const import DOMAIN
+from .program_engine import get_program_engine
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    manager = hass.data[DOMAIN].get(entry.entry_id)
+    diagnostics = {
+        "entry": {
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "connection_broker": get_connection_broker(hass).metrics(),
+        "program_engine": get_program_engine(hass).metrics(),
+        "clock_sync": get_clock_sync(hass).metrics(),
+    }
+    if manager is not None:
+        manager.update_link_info()
+        diagnostics["device"] = manager.as_diagnostics()
+    return diagnostics
@@ -0,0 +1,42 @@
+"""Run one command on many diffusers concurrently."""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__package__)
+
+DEFAULT_CONCURRENCY = 10  # Devices worked on at the same time
+DEFAULT_DEVICE_TIMEOUT = 30.0  # Seconds one device may take, including connecting
+
+
+async def fan_out(managers, command, concurrency: int = DEFAULT_CONCURRENCY,
+                  timeout: float = DEFAULT_DEVICE_TIMEOUT) -> dict:
+    """Call ``command(manager)`` for every manager and aggregate the outcome.
+
+    At most ``concurrency`` devices are in progress at once and each one gets
+    ``timeout`` seconds from the moment it starts, so the whole call takes
+    about as long as the slowest device rather than the sum of all of them.
+    ``command`` returns False or raises when a device could not be controlled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def run(manager):
+        async with semaphore:
+            try:
+                if await asyncio.wait_for(command(manager), timeout):
+                    return None
+                return "not reachable"
+            except asyncio.TimeoutError:
+                return f"timed out after {timeout:g}s"
+            except Exception as e:
+                logger.debug("Command for %s failed: %s", manager.device_id, e)
+                return str(e) or type(e).__name__
+
+    errors = await asyncio.gather(*(run(manager) for manager in managers))
+    failed = {manager.device_id: error for manager, error in zip(managers, errors) if error is not None}
+    return {
+        "succeeded": [manager.device_id for manager, error in zip(managers, errors) if error is None],
+        "failed": failed,
+        "duration": round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,84 @@
+"""Incremental reader for the diffuser notification stream.
+
+BLE proxies do not guarantee that one GATT notification carries exactly one
+frame: a frame may be split across notifications, or several frames may be
+coalesced into one. The reader buffers incoming bytes and returns every
+complete, checksum-valid frame.
+"""
+from typing import List
+
+from . import codec
+
+
+class FrameReader:
+    def __init__(self):
+        self._buffer = bytearray()
+        self.frames = 0
+        self.resyncs = 0
+        self.bad_checksums = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes that do not form a complete frame yet."""
+        return len(self._buffer)
+
+    def reset(self):
+        """Drop any partial frame, e.g. after a disconnect."""
+        del self._buffer[:]
+
+    def feed(self, data) -> List[codec.Frame]:
+        """Append received bytes and return the frames completed by them."""
+        buffer = self._buffer
+        if not buffer and len(data) > 1 and data[0] == codec.HEADER \
+                and len(data) == codec.frame_length(data[1]):
+            # Common case: one notification carries exactly one frame.
+            try:
+                frame = codec.decode_frame(data)
+            except codec.ChecksumError:
+                pass
+            else:
+                self.frames += 1
+                return [frame]
+
+        buffer += data
+        frames = []
+        pos = 0
+        end = len(buffer)
+
+        with memoryview(buffer) as view:
+            while pos < end:
+                start = buffer.find(codec.HEADER, pos)
+                if start < 0:
+                    # No header anywhere in the remaining bytes, drop them.
+                    self.resyncs += 1
+                    pos = end
+                    break
+                if start != pos:
+                    self.resyncs += 1
+                    pos = start
+                if end - pos < 2:
+                    break
+
+                length = codec.frame_length(buffer[pos + 1])
+                if not length:
+                    # 0xA5 inside garbage, not a frame header.
+                    self.resyncs += 1
+                    pos += 1
+                    continue
+                if end - pos < length:
+                    break
+
+                try:
+                    frames.append(codec.decode_frame(view[pos:pos + length]))
+                except codec.ChecksumError:
+                    # The header may belong to a truncated frame; rescan
+                    # from the next byte to find the real frame start.
+                    self.bad_checksums += 1
+                    pos += 1
+                    continue
+                pos += length
+
+        if pos:
+            del buffer[:pos]
+        self.frames += len(frames)
+        return frames
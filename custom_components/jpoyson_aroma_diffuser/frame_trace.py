@@ -0,0 +1,44 @@
+"""Fixed-size in-memory record of the raw frames exchanged with one device."""
+import collections
+import time
+from datetime import datetime, timezone
+
+TX = "tx"
+RX = "rx"
+
+DEFAULT_TRACE_SIZE = 256  # Frames kept per device
+
+
+class FrameTrace:
+    """Ring buffer of ``(timestamp, direction, payload)`` entries.
+
+    Appending is a copy of a few bytes and a deque append; timestamps are only
+    formatted and payloads hex-encoded when the trace is dumped.
+    """
+
+    __slots__ = ("_entries", "total")
+
+    def __init__(self, size: int = DEFAULT_TRACE_SIZE):
+        self._entries = collections.deque(maxlen=size)
+        self.total = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, direction: str, payload):
+        self._entries.append((time.time(), direction, bytes(payload)))
+        self.total += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def dump(self) -> list:
+        """Return the buffered frames, oldest first, in a JSON-friendly form."""
+        return [
+            {
+                "time": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="milliseconds"),
+                "direction": direction,
+                "data": payload.hex().upper(),
+            }
+            for timestamp, direction, payload in self._entries
+        ]
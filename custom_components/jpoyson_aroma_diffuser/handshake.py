@@ -0,0 +1,43 @@
+"""Connection lifecycle states and reply tracking for the post-connect handshake."""
+import asyncio
+from enum import Enum
+
+
+class ConnectionState(str, Enum):
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    SUBSCRIBING = "subscribing"
+    CLOCK_SYNC = "clock_sync"
+    QUERYING = "querying"
+    READY = "ready"
+
+
+class SlotWaiters:
+    """Futures waiting for the A5FB status frame of a timer slot."""
+
+    def __init__(self):
+        self._waiters = {}
+
+    def wait(self, slot: int) -> asyncio.Future:
+        """Return a future resolved with the next status frame for ``slot``."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(slot, []).append(future)
+        return future
+
+    def resolve(self, slot: int, frame):
+        for future in self._waiters.pop(slot, ()):
+            if not future.done():
+                future.set_result(frame)
+
+    def discard(self, slot: int, future: asyncio.Future):
+        waiters = self._waiters.get(slot)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[slot]
+
+    def cancel_all(self):
+        for waiters in self._waiters.values():
+            for future in waiters:
+                future.cancel()
+        self._waiters.clear()
@@ -0,0 +1,158 @@
+"""Learned quality of every adapter or proxy path to every diffuser.
+
+A path is the combination of a diffuser and the scanner (local adapter or
+ESPHome proxy) that connects to it. Paths are ranked by advertisement RSSI,
+whether the scanner has a free connection slot, and the connect and write
+latency and failure rate seen through it before. The history is persisted so
+a restart does not forget which proxies work for which device.
+"""
+import asyncio
+from typing import NamedTuple, Optional
+
+from homeassistant.helpers.storage import Store
+
+from .connection_broker import DEFAULT_SOURCE
+from .const import DATA_PATH_SCORES, DOMAIN
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.path_scores"
+SAVE_DELAY = 30  # Seconds to batch score changes into one write
+
+EWMA_WEIGHT = 0.3  # Weight of the newest sample in the latency averages
+HISTORY_LIMIT = 20  # Connection outcomes after which older ones count half, so a path can recover
+UNKNOWN_RSSI = -80  # Assumed for a path without a recent advertisement
+
+# Penalties in dB-equivalents, subtracted from the RSSI
+NO_FREE_SLOT_PENALTY = 30
+FAILURE_PENALTY = 40  # At a 100% failure rate
+CONNECT_LATENCY_PENALTY = 5  # Per second
+WRITE_LATENCY_PENALTY = 100  # Per second
+
+
+class PathCandidate(NamedTuple):
+    ble_device: object
+    source: Optional[str]
+    rssi: Optional[int]
+    free_slots: Optional[int]  # None when the scanner does not report allocations
+
+
+class PathStats:
+    __slots__ = ("connect_latency", "write_latency", "successes", "failures")
+
+    def __init__(self, connect_latency=None, write_latency=None, successes=0, failures=0):
+        self.connect_latency = connect_latency
+        self.write_latency = write_latency
+        self.successes = successes
+        self.failures = failures
+
+    @staticmethod
+    def _ewma(average, sample):
+        return sample if average is None else average + EWMA_WEIGHT * (sample - average)
+
+    def record_connect(self, seconds: Optional[float]):
+        """Record a connection attempt; ``seconds`` is None when it failed."""
+        if seconds is None:
+            self.failures += 1
+        else:
+            self.successes += 1
+            self.connect_latency = self._ewma(self.connect_latency, seconds)
+        if self.successes + self.failures > HISTORY_LIMIT:
+            self.successes /= 2
+            self.failures /= 2
+
+    def record_write(self, seconds: float):
+        self.write_latency = self._ewma(self.write_latency, seconds)
+
+    @property
+    def failure_rate(self) -> float:
+        attempts = self.successes + self.failures
+        return self.failures / attempts if attempts else 0.0
+
+    def penalty(self) -> float:
+        return (self.failure_rate * FAILURE_PENALTY
+                + (self.connect_latency or 0.0) * CONNECT_LATENCY_PENALTY
+                + (self.write_latency or 0.0) * WRITE_LATENCY_PENALTY)
+
+    def as_dict(self) -> dict:
+        return {
+            "connect_latency": self.connect_latency,
+            "write_latency": self.write_latency,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+def get_path_scores(hass) -> "PathScores":
+    """Return the scores shared by every config entry of this integration."""
+    scores = hass.data.get(DATA_PATH_SCORES)
+    if scores is None:
+        scores = hass.data[DATA_PATH_SCORES] = PathScores(hass)
+    return scores
+
+
+class PathScores:
+    def __init__(self, hass, store=None):
+        self._store = store or Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._paths = {}  # device_id -> {source: PathStats}
+        self._loaded = False
+        self._loading = None
+
+    async def async_load(self):
+        if self._loaded:
+            return
+        if self._loading is None:
+            self._loading = asyncio.get_running_loop().create_task(self._load())
+        await self._loading
+
+    async def _load(self):
+        data = await self._store.async_load() or {}
+        for device_id, sources in data.get("paths", {}).items():
+            paths = self._paths.setdefault(device_id, {})
+            for source, stats in sources.items():
+                paths.setdefault(source, PathStats(**stats))
+        self._loaded = True
+
+    def stats(self, device_id, source) -> PathStats:
+        source = source or DEFAULT_SOURCE
+        paths = self._paths.setdefault(device_id, {})
+        stats = paths.get(source)
+        if stats is None:
+            stats = paths[source] = PathStats()
+        return stats
+
+    def score(self, device_id, candidate: PathCandidate) -> float:
+        """Higher is better: RSSI in dBm minus penalties for a busy scanner and a bad history."""
+        score = candidate.rssi if candidate.rssi is not None else UNKNOWN_RSSI
+        if candidate.free_slots == 0:
+            score -= NO_FREE_SLOT_PENALTY
+        stats = self._paths.get(device_id, {}).get(candidate.source or DEFAULT_SOURCE)
+        if stats is not None:
+            score -= stats.penalty()
+        return score
+
+    def rank(self, device_id, candidates) -> list:
+        return sorted(candidates, key=lambda candidate: self.score(device_id, candidate), reverse=True)
+
+    def record_connect(self, device_id, source, seconds: Optional[float]):
+        self.stats(device_id, source).record_connect(seconds)
+        if self._loaded:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def record_write(self, device_id, source, seconds: float):
+        # Saved together with the next connection outcome, not on every write.
+        self.stats(device_id, source).record_write(seconds)
+
+    def remove(self, device_id):
+        if self._paths.pop(device_id, None) is not None and self._loaded:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def as_dict(self, device_id) -> dict:
+        return {source: stats.as_dict() for source, stats in self._paths.get(device_id, {}).items()}
+
+    def _data_to_save(self) -> dict:
+        return {
+            "paths": {
+                device_id: {source: stats.as_dict() for source, stats in sources.items()}
+                for device_id, sources in self._paths.items()
+            }
+        }
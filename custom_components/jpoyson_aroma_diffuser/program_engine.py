@@ -0,0 +1,157 @@
+"""Host-side scent programs: daily sequences of power, working and pause steps.
+
+Every diffuser with a program has exactly one entry in a hass-wide heap,
+keyed by the time of its next transition. A single loop timer is armed for
+the earliest entry, so hundreds of devices cost one wakeup per distinct
+transition time rather than one scheduled callback per device and step.
+"""
+import bisect
+import heapq
+import itertools
+import logging
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_PROGRAM_ENGINE
+
+logger = logging.getLogger(__package__)
+
+
+class ProgramStep(NamedTuple):
+    at: time
+    working_time: int
+    pause_time: int
+    power: bool
+
+
+def parse_program(data) -> list:
+    """Build sorted steps from their stored form (``at`` as an ISO time string)."""
+    return sorted(
+        ProgramStep(time.fromisoformat(step["at"]), int(step["working_time"]), int(step["pause_time"]),
+                    bool(step.get("power", True)))
+        for step in data or ()
+    )
+
+
+def serialize_program(steps) -> list:
+    return [{**step._asdict(), "at": step.at.isoformat()} for step in steps]
+
+
+def active_step(steps, now: datetime) -> ProgramStep:
+    """The step in effect at ``now``; before the first step of a day the last one still applies."""
+    index = bisect.bisect_right([step.at for step in steps], now.time().replace(tzinfo=None)) - 1
+    return steps[index]
+
+
+def next_transition(steps, now: datetime) -> datetime:
+    """The first step time after ``now``, today or tomorrow."""
+    current = now.time().replace(tzinfo=None)
+    for step in steps:
+        if step.at > current:
+            return datetime.combine(now.date(), step.at, tzinfo=now.tzinfo)
+    return datetime.combine(now.date() + timedelta(days=1), steps[0].at, tzinfo=now.tzinfo)
+
+
+def get_program_engine(hass) -> "ProgramEngine":
+    """Return the engine shared by every config entry of this integration."""
+    engine = hass.data.get(DATA_PROGRAM_ENGINE)
+    if engine is None:
+        engine = hass.data[DATA_PROGRAM_ENGINE] = ProgramEngine(hass)
+    return engine
+
+
+class ProgramEngine:
+    def __init__(self, hass, now=dt_util.now):
+        self.hass = hass
+        self._now = now
+        self._programs = {}  # manager -> (steps, generation)
+        self._heap = []  # (timestamp, generation, manager); entries of replaced programs are skipped lazily
+        self._generation = itertools.count()
+        self._timer = None
+        self._timer_at = None
+        self.wakeups = 0
+        self.transitions = 0
+
+    def __len__(self):
+        return len(self._programs)
+
+    def set_program(self, manager, steps):
+        """Run ``steps`` on ``manager`` from now on, replacing any previous program."""
+        if not steps:
+            self.remove(manager)
+            return
+        steps = sorted(steps)
+        generation = next(self._generation)
+        self._programs[manager] = (steps, generation)
+        now = self._now()
+        manager.apply_program_step(active_step(steps, now))
+        heapq.heappush(self._heap, (next_transition(steps, now).timestamp(), generation, manager))
+        self._arm()
+
+    def remove(self, manager):
+        if self._programs.pop(manager, None) is not None:
+            self._arm()
+
+    def refresh(self, manager):
+        """Re-apply the step in effect, e.g. after the device reconnected."""
+        program = self._programs.get(manager)
+        if program is not None:
+            manager.apply_program_step(active_step(program[0], self._now()))
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._programs.clear()
+        self._heap.clear()
+
+    def _is_current(self, entry) -> bool:
+        program = self._programs.get(entry[2])
+        return program is not None and program[1] == entry[1]
+
+    def _arm(self):
+        """Point the single timer at the earliest pending transition."""
+        heap = self._heap
+        while heap and not self._is_current(heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = self._timer_at = None
+            return
+        when = heap[0][0]
+        if self._timer is not None:
+            if self._timer_at == when:
+                return
+            self._timer.cancel()
+        self._timer_at = when
+        self._timer = self.hass.loop.call_later(max(0.0, when - self._now().timestamp()), self._wake)
+
+    def _wake(self):
+        self._timer = self._timer_at = None
+        self.wakeups += 1
+        now = self._now()
+        heap = self._heap
+        while heap and heap[0][0] <= now.timestamp():
+            entry = heapq.heappop(heap)
+            if not self._is_current(entry):
+                continue
+            when, generation, manager = entry
+            steps = self._programs[manager][0]
+            # Evaluate at the scheduled time so an early wakeup still crosses the transition.
+            at = max(now, datetime.fromtimestamp(when, now.tzinfo))
+            self.transitions += 1
+            manager.apply_program_step(active_step(steps, at))
+            heapq.heappush(heap, (next_transition(steps, at).timestamp(), generation, manager))
+        self._arm()
+
+    def metrics(self) -> dict:
+        return {
+            "programs": len(self._programs),
+            "scheduled": len(self._heap),
+            "wakeups": self.wakeups,
+            "transitions": self.transitions,
+            "next_wakeup": self._timer_at,
+        }
@@ -0,0 +1,125 @@
+"""Single-flight reconnect loop with jittered backoff and a circuit breaker."""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__package__)
+
+
+class ReconnectSupervisor:
+    """Owns the only task allowed to (re)connect one device.
+
+    Callers never connect on their own: they ask the supervisor to make sure a
+    connection attempt is running and may wait for it with a timeout. After
+    ``failure_threshold`` consecutive failures the circuit opens, waiters fail
+    fast and the loop only retries once every ``cooldown`` seconds.
+    ``on_circuit_change`` is called whenever the circuit opens or closes.
+    """
+
+    def __init__(self, name: str, connect: Callable[[], Awaitable[bool]],
+                 create_task: Callable[[Awaitable, str], asyncio.Task],
+                 base_delay: float = 2.0, max_delay: float = 60.0,
+                 failure_threshold: int = 5, cooldown: float = 300.0,
+                 on_circuit_change: Optional[Callable[[], None]] = None):
+        self.name = name
+        self._connect = connect
+        self._create_task = create_task
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._on_circuit_change = on_circuit_change
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._open_until = 0.0
+        self.tripped = False  # The circuit has opened since the last successful connect
+        self.failures = 0
+        self.attempts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def request(self, delay: float = 0.0) -> asyncio.Task:
+        """Start the reconnect loop unless it is already running."""
+        if not self.running:
+            self._task = self._create_task(self._run(delay), f"reconnect {self.name}")
+        return self._task
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the running attempt to connect."""
+        if self.circuit_open:
+            return False
+        # Someone is waiting, so skip whatever is left of the backoff delay.
+        self._wakeup.set()
+        task = self.request()
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # The supervisor was stopped; only propagate our own cancellation.
+            if task.cancelled():
+                return False
+            raise
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def _circuit_changed(self):
+        if self._on_circuit_change is not None:
+            self._on_circuit_change()
+
+    def _backoff(self) -> float:
+        # Exponential backoff with equal jitter so devices that dropped at the
+        # same time do not retry in lockstep.
+        delay = min(self.base_delay * 2 ** (self.failures - 1), self.max_delay)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _run(self, delay: float) -> bool:
+        if delay:
+            await asyncio.sleep(delay)
+        while True:
+            self.attempts += 1
+            if await self._connect():
+                was_tripped = self.tripped
+                self.failures = 0
+                self._open_until = 0.0
+                self.tripped = False
+                if was_tripped:
+                    self._circuit_changed()
+                return True
+
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                was_tripped = self.tripped
+                self._open_until = time.monotonic() + self.cooldown
+                self.tripped = True
+                if not was_tripped:
+                    # Logged once per outage, not after every cooldown.
+                    logger.warning(f"{self.name}: {self.failures} failed connection attempts, "
+                                   f"retrying every {self.cooldown:.0f}s")
+                self._circuit_changed()
+                await asyncio.sleep(self.cooldown)
+                # The cooldown has closed the circuit; waiters may join the next attempt.
+                self._circuit_changed()
+            else:
+                delay = self._backoff()
+                logger.info(f"{self.name}: reconnecting in {delay:.1f}s (attempt {self.failures + 1})")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
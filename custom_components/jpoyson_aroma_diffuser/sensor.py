@@ -1,6 +1,16 @@
 import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
 
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import SIGNAL_STRENGTH_DECIBELS_MILLIWATT, EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import Entity
 
@@ -16,28 +26,122 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     sensors = []
     for i in range(4):
         sensors.append(TimerSlotSensor(hass, device_manager, i))
+    for description in DIAGNOSTIC_SENSORS:
+        sensors.append(DiagnosticSensor(device_manager, description))
 
-    async_add_entities(sensors, True)
+    async_add_entities(sensors)
+
+
+@dataclass(frozen=True, kw_only=True)
+class DiagnosticSensorDescription(SensorEntityDescription):
+    value_fn: Callable[[Any], Any]
+    attributes_fn: Callable[[Any], dict] = lambda telemetry: None
+    refresh_link: bool = False
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+DIAGNOSTIC_SENSORS = (
+    DiagnosticSensorDescription(
+        key="write_latency",
+        name="Write Latency",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda telemetry: _ms(telemetry.write_latency.mean),
+        attributes_fn=lambda telemetry: {
+            "p50_ms": _ms(telemetry.write_latency.percentile(0.5)),
+            "p95_ms": _ms(telemetry.write_latency.percentile(0.95)),
+            "max_ms": _ms(telemetry.write_latency.max),
+            "count": telemetry.write_latency.count,
+        },
+    ),
+    DiagnosticSensorDescription(
+        key="notification_rate",
+        name="Notification Rate",
+        native_unit_of_measurement="notifications/min",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda telemetry: round(telemetry.notifications.per_minute(time.monotonic()), 1),
+    ),
+    DiagnosticSensorDescription(
+        key="handshake_duration",
+        name="Handshake Duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda telemetry: _ms(telemetry.handshake.last) if telemetry.handshake.count else None,
+    ),
+    DiagnosticSensorDescription(
+        key="reconnects",
+        name="Reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda telemetry: telemetry.reconnects,
+        attributes_fn=lambda telemetry: {
+            "disconnects": telemetry.disconnects,
+            "connect_failures": telemetry.connect_failures,
+        },
+    ),
+    DiagnosticSensorDescription(
+        key="time_to_reconnect",
+        name="Time To Reconnect",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda telemetry: (
+            round(telemetry.time_to_reconnect.last, 2) if telemetry.time_to_reconnect.count else None
+        ),
+    ),
+    DiagnosticSensorDescription(
+        key="rssi",
+        name="Signal Strength",
+        device_class=SensorDeviceClass.SIGNAL_STRENGTH,
+        native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda telemetry: telemetry.rssi,
+        refresh_link=True,
+    ),
+    DiagnosticSensorDescription(
+        key="connection_path",
+        name="Connection Path",
+        value_fn=lambda telemetry: telemetry.source,
+        attributes_fn=lambda telemetry: {"advertisement_source": telemetry.advertisement_source},
+        refresh_link=True,
+    ),
+)
 
 
 class TimerSlotSensor(Entity):
+    _attr_should_poll = False
+
     def __init__(self, hass, device_manager, slot):
         self.hass = hass
         self._device_manager = device_manager
         self.slot = slot
-        self._state = None
 
     @property
     def name(self):
         return f"Timer Slot {self.slot + 1}"
 
+    @property
+    def _timer(self):
+        return self._device_manager.state_object_array[self.slot]
+
     @property
     def state(self):
-        return self._state
+        timer = self._timer
+        if timer is None:
+            return None
+        return f"{timer.start_hour:02d}:{timer.start_min:02d}-{timer.stop_hour:02d}:{timer.stop_min:02d}"
 
     @property
-    def device_state_attributes(self):
-        return self._state
+    def extra_state_attributes(self):
+        timer = self._timer
+        if timer is None:
+            return None
+        # week is a bitmask. 1 = Monday, 2 = Tuesday, 4 = Wednesday, 8 = Thursday, 16 = Friday, 32 = Saturday, 64 = Sunday
+        return {**timer._asdict(), "confirmed": self._device_manager.slot_confirmed[self.slot]}
 
     @property
     def device_info(self):
@@ -51,5 +155,38 @@ class TimerSlotSensor(Entity):
     def unique_id(self):
         return f"{self._device_manager.device_id}_slot_{self.slot}"
 
+    @property
+    def available(self):
+        return self._device_manager.available
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(self._device_manager.add_listener(self.async_write_ha_state))
+        self.async_on_remove(self._device_manager.add_slot_listener(self.slot, self.async_write_ha_state))
+
+
+class DiagnosticSensor(SensorEntity):
+    """Opt-in link performance sensor, polled from the device manager's telemetry."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, device_manager, description: DiagnosticSensorDescription):
+        self._device_manager = device_manager
+        self.entity_description = description
+        self._attr_name = description.name
+        self._attr_unique_id = f"{device_manager.device_id}_{description.key}"
+
+    @property
+    def device_info(self):
+        return {
+            "identifiers": {(DOMAIN, self._device_manager.device_id)},
+            "name": "JPoyson Aroma Diffuser",
+            "manufacturer": "J Poyson",
+        }
+
     async def async_update(self):
-        self._state = self._device_manager.state_object_array[self.slot]
+        if self.entity_description.refresh_link:
+            self._device_manager.update_link_info()
+        telemetry = self._device_manager.telemetry
+        self._attr_native_value = self.entity_description.value_fn(telemetry)
+        self._attr_extra_state_attributes = self.entity_description.attributes_fn(telemetry)
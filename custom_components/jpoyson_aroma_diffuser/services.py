@@ -0,0 +1,156 @@
+"""Integration-wide services."""
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+
+from . import codec
+from .const import ALL_WEEK, DOMAIN, PROGRAM, WEEKDAYS
+from .fan_out import DEFAULT_CONCURRENCY, DEFAULT_DEVICE_TIMEOUT, fan_out
+from .program_engine import ProgramStep, serialize_program
+
+SERVICE_DUMP_FRAMES = "dump_frames"
+SERVICE_SET_SCHEDULE = "set_schedule"
+SERVICE_SET_POWER = "set_power"
+SERVICE_SET_PROGRAM = "set_program"
+
+ATTR_DEVICE_ID = "device_id"
+ATTR_CLEAR = "clear"
+ATTR_SLOTS = "slots"
+ATTR_SLOT = "slot"
+ATTR_WEEKDAYS = "weekdays"
+ATTR_START = "start"
+ATTR_STOP = "stop"
+ATTR_WORKING_TIME = "working_time"
+ATTR_PAUSE_TIME = "pause_time"
+ATTR_POWER = "power"
+ATTR_CONCURRENCY = "concurrency"
+ATTR_TIMEOUT = "timeout"
+ATTR_STEPS = "steps"
+ATTR_AT = "at"
+
+DUMP_FRAMES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DEVICE_ID): cv.string,
+    vol.Optional(ATTR_CLEAR, default=False): cv.boolean,
+})
+
+SLOT_SCHEMA = vol.Schema({
+    vol.Required(ATTR_SLOT): vol.All(vol.Coerce(int), vol.Range(min=1, max=codec.TIMER_SLOTS)),
+    vol.Optional(ATTR_WEEKDAYS, default=list(WEEKDAYS)): vol.All(cv.ensure_list, [vol.In(WEEKDAYS)]),
+    vol.Optional(ATTR_START, default="00:00"): cv.time,
+    vol.Optional(ATTR_STOP, default="23:59"): cv.time,
+    vol.Required(ATTR_WORKING_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+    vol.Required(ATTR_PAUSE_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+})
+
+SET_SCHEDULE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DEVICE_ID): cv.string,
+    vol.Required(ATTR_SLOTS): vol.All(cv.ensure_list, [SLOT_SCHEMA]),
+})
+
+SET_POWER_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Required(ATTR_POWER): cv.boolean,
+    vol.Optional(ATTR_CONCURRENCY, default=DEFAULT_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Optional(ATTR_TIMEOUT, default=DEFAULT_DEVICE_TIMEOUT): vol.All(vol.Coerce(float), vol.Range(min=1)),
+})
+
+PROGRAM_STEP_SCHEMA = vol.Schema({
+    vol.Required(ATTR_AT): cv.time,
+    vol.Required(ATTR_WORKING_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+    vol.Required(ATTR_PAUSE_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+    vol.Optional(ATTR_POWER, default=True): cv.boolean,
+})
+
+SET_PROGRAM_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_STEPS, default=[]): vol.All(cv.ensure_list, [PROGRAM_STEP_SCHEMA]),
+})
+
+
+def weekday_mask(weekdays) -> int:
+    """Encode day names as a timer slot weekday mask."""
+    if set(weekdays) == set(WEEKDAYS):
+        return ALL_WEEK
+    return sum(1 << WEEKDAYS.index(day) for day in set(weekdays))
+
+
+def timer_slot(data: dict) -> codec.TimerSlot:
+    start, stop = data[ATTR_START], data[ATTR_STOP]
+    return codec.TimerSlot(weekday_mask(data[ATTR_WEEKDAYS]), start.hour, start.minute, stop.hour, stop.minute,
+                           data[ATTR_WORKING_TIME], data[ATTR_PAUSE_TIME])
+
+
+def get_device_manager(hass: HomeAssistant, device_id: str):
+    """Return the DeviceManager behind a device registry id."""
+    device = dr.async_get(hass).async_get(device_id)
+    managers = hass.data.get(DOMAIN, {})
+    if device is not None:
+        for entry_id in device.config_entries:
+            if entry_id in managers:
+                return managers[entry_id]
+    raise ServiceValidationError(f"{device_id} is not a loaded JPoyson Aroma Diffuser")
+
+
+def async_setup_services(hass: HomeAssistant):
+    async def dump_frames(call: ServiceCall) -> dict:
+        manager = get_device_manager(hass, call.data[ATTR_DEVICE_ID])
+        frames = manager.frame_trace.dump()
+        if call.data[ATTR_CLEAR]:
+            manager.frame_trace.clear()
+        return {"frames": frames}
+
+    async def set_schedule(call: ServiceCall) -> dict:
+        manager = get_device_manager(hass, call.data[ATTR_DEVICE_ID])
+        timers = {slot[ATTR_SLOT]: timer_slot(slot) for slot in call.data[ATTR_SLOTS]}
+        try:
+            changed, unconfirmed = await manager.async_set_schedule(timers)
+        except ConnectionError as e:
+            raise HomeAssistantError(str(e)) from e
+        return {"changed": changed, "unconfirmed": unconfirmed}
+
+    async def set_power(call: ServiceCall) -> dict:
+        if ATTR_DEVICE_ID in call.data:
+            managers = list({id(manager): manager for manager in (
+                get_device_manager(hass, device_id) for device_id in call.data[ATTR_DEVICE_ID])}.values())
+        else:
+            managers = list(hass.data.get(DOMAIN, {}).values())
+
+        async def command(manager):
+            confirmed = False
+
+            async def switch():
+                nonlocal confirmed
+                confirmed = await (manager.turn_on_device() if call.data[ATTR_POWER] else manager.turn_off_device())
+
+            if not await manager.async_run_command(switch):
+                return False
+            if not confirmed:
+                raise HomeAssistantError("not confirmed by the device")
+            return True
+
+        result = await fan_out(managers, command, call.data[ATTR_CONCURRENCY], call.data[ATTR_TIMEOUT])
+        if result["failed"] and not call.return_response:
+            raise HomeAssistantError(f"Failed to switch {len(result['failed'])} of {len(managers)} diffusers: "
+                                     f"{result['failed']}")
+        return result
+
+    async def set_program(call: ServiceCall):
+        steps = sorted(ProgramStep(step[ATTR_AT], step[ATTR_WORKING_TIME], step[ATTR_PAUSE_TIME], step[ATTR_POWER])
+                       for step in call.data[ATTR_STEPS])
+        if len({step.at for step in steps}) != len(steps):
+            raise ServiceValidationError("Program steps must have distinct times")
+        for device_id in call.data[ATTR_DEVICE_ID]:
+            manager = get_device_manager(hass, device_id)
+            hass.config_entries.async_update_entry(
+                manager.config_entry, options={**manager.config_entry.options, PROGRAM: serialize_program(steps)})
+            manager.set_program(steps)
+
+    hass.services.async_register(DOMAIN, SERVICE_DUMP_FRAMES, dump_frames, schema=DUMP_FRAMES_SCHEMA,
+                                 supports_response=SupportsResponse.ONLY)
+    hass.services.async_register(DOMAIN, SERVICE_SET_SCHEDULE, set_schedule, schema=SET_SCHEDULE_SCHEMA,
+                                 supports_response=SupportsResponse.OPTIONAL)
+    hass.services.async_register(DOMAIN, SERVICE_SET_POWER, set_power, schema=SET_POWER_SCHEMA,
+                                 supports_response=SupportsResponse.OPTIONAL)
+    hass.services.async_register(DOMAIN, SERVICE_SET_PROGRAM, set_program, schema=SET_PROGRAM_SCHEMA)
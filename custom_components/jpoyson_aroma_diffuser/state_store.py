@@ -0,0 +1,73 @@
+"""Last known power and timer slot state of every diffuser, persisted across restarts."""
+import asyncio
+import time
+from typing import Optional
+
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_STATE_STORE, DOMAIN
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.device_state"
+SAVE_DELAY = 10  # Seconds to batch state changes into one write
+STATE_FRESH_FOR = 3600  # Seconds a saved state is trusted enough to skip most of the query sweep
+
+
+def get_state_store(hass) -> "DeviceStateStore":
+    """Return the store shared by every config entry of this integration."""
+    store = hass.data.get(DATA_STATE_STORE)
+    if store is None:
+        store = hass.data[DATA_STATE_STORE] = DeviceStateStore(hass)
+    return store
+
+
+class DeviceStateStore:
+    """One storage file holding ``{device_id: {"power", "slots", "updated"}}``.
+
+    The file is read once, the first time an entry is set up; afterwards every
+    lookup is served from memory and changes are written in debounced batches.
+    """
+
+    def __init__(self, hass, store=None):
+        self._store = store or Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._devices = None
+        self._loading = None
+
+    async def async_load(self):
+        if self._devices is not None:
+            return
+        if self._loading is None:
+            self._loading = asyncio.get_running_loop().create_task(self._load())
+        await self._loading
+
+    async def _load(self):
+        data = await self._store.async_load() or {}
+        self._devices = data.get("devices", {})
+
+    def get(self, device_id) -> Optional[dict]:
+        if not self._devices:
+            return None
+        return self._devices.get(device_id)
+
+    @staticmethod
+    def is_fresh(state: Optional[dict]) -> bool:
+        return state is not None and time.time() - state.get("updated", 0) < STATE_FRESH_FOR
+
+    def update(self, device_id, power: bool, slots, **extra):
+        """Record the state of a device and schedule a save."""
+        if self._devices is None:
+            return
+        self._devices[device_id] = {
+            "power": power,
+            "slots": [list(slot) if slot else None for slot in slots],
+            "updated": time.time(),
+            **extra,
+        }
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def remove(self, device_id):
+        if self._devices and self._devices.pop(device_id, None) is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict:
+        return {"devices": self._devices}
@@ -3,6 +3,7 @@ import logging
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 
 from .const import DOMAIN
 
@@ -17,6 +18,8 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
 
 
 class JPoysonAromaDiffuserDeviceSwitch(SwitchEntity):
+    _attr_should_poll = False
+
     def __init__(self, device_manager):
         self._device_manager = device_manager
         self._is_on = self._device_manager.power_status
@@ -38,34 +41,46 @@ class JPoysonAromaDiffuserDeviceSwitch(SwitchEntity):
     def unique_id(self):
         return self._device_manager.device_id
 
+    @property
+    def available(self):
+        return self._device_manager.available
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(self._device_manager.add_listener(self.async_write_ha_state))
+
     @property
     def is_on(self):
         return self._is_on
 
+    @property
+    def assumed_state(self):
+        return not self._device_manager.power_confirmed
+
+    @property
+    def extra_state_attributes(self):
+        return {"confirmed": self._device_manager.power_confirmed}
+
+    # The state follows the device's A5FB reply, or the requested state marked
+    # as assumed when the device never answers; both arrive through the power
+    # status callback.
     async def async_turn_on(self, **kwargs):
-        if not self._device_manager.connected:
-            logger.info("Device is not connected.")
-            is_success = await self._device_manager.try_reconnect()
-            logger.info("is_success: %s", is_success)
-            if not is_success:
-                logger.info("Failed to reconnect to the device.")
-                return
-
-        await self._device_manager.turn_on_device()
-        self._is_on = True
-        self.async_write_ha_state()
+        await self._async_set_power(True, self._device_manager.turn_on_device)
 
     async def async_turn_off(self, **kwargs):
-        if not self._device_manager.connected:
-            logger.info("Device is not connected.")
-            is_success = await self._device_manager.try_reconnect()
-            if not is_success:
-                logger.info("Failed to reconnect to the device.")
-                return
-
-        await self._device_manager.turn_off_device()
-        self._is_on = False
-        self.async_write_ha_state()
+        await self._async_set_power(False, self._device_manager.turn_off_device)
+
+    async def _async_set_power(self, power, command):
+        manager = self._device_manager
+        try:
+            connected = await manager.async_run_command(command)
+        except ConnectionError as e:
+            raise HomeAssistantError(str(e)) from e
+        if not connected:
+            raise HomeAssistantError(f"Could not connect to {manager.device_id}")
+        # No echo at all keeps the requested state as assumed; a contradicting echo is a failure.
+        if manager.power_confirmed and manager.power_status != power:
+            raise HomeAssistantError(f"{manager.device_id} reports power {'on' if manager.power_status else 'off'} "
+                                     f"after it was switched {'on' if power else 'off'}")
 
     def _on_power_status_changed(self, is_on):
         logger.info("Power status changed: %s", is_on)
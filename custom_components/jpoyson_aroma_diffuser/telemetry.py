@@ -0,0 +1,145 @@
+"""Lightweight performance counters kept per device."""
+import time
+
+
+class LatencyStats:
+    """Running count, mean and extremes of a latency in seconds."""
+
+    __slots__ = ("count", "total", "min", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds: float):
+        if not self.count or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "min": round(self.min, 4),
+            "max": round(self.max, 4),
+            "last": round(self.last, 4),
+        }
+
+
+class LatencyHistogram(LatencyStats):
+    """LatencyStats plus counts per fixed bucket, for percentiles without keeping samples."""
+
+    __slots__ = ("buckets",)
+
+    BOUNDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Upper bounds in seconds
+
+    def __init__(self):
+        super().__init__()
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+
+    def record(self, seconds: float):
+        super().record(seconds)
+        for index, bound in enumerate(self.BOUNDS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if seen >= threshold:
+                return self.BOUNDS[index]
+        return self.max
+
+    def as_dict(self) -> dict:
+        data = super().as_dict()
+        data["p50"] = self.percentile(0.5)
+        data["p95"] = self.percentile(0.95)
+        data["buckets"] = {
+            **{f"<={bound * 1000:g}ms": count for bound, count in zip(self.BOUNDS, self.buckets)},
+            f">{self.BOUNDS[-1] * 1000:g}ms": self.buckets[-1],
+        }
+        return data
+
+
+class RateMeter:
+    """Events per minute over the last complete one-minute window."""
+
+    __slots__ = ("total", "_window_start", "_window_count", "rate")
+
+    WINDOW = 60.0
+
+    def __init__(self):
+        self.total = 0
+        self._window_start = None
+        self._window_count = 0
+        self.rate = 0.0
+
+    def tick(self, now: float):
+        self.total += 1
+        if self._window_start is None:
+            self._window_start = now
+        elif now - self._window_start >= self.WINDOW:
+            elapsed = now - self._window_start
+            self.rate = self._window_count * 60.0 / elapsed
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+    def per_minute(self, now: float) -> float:
+        """Current rate, falling back to the running window once it is overdue."""
+        if self._window_start is not None and now - self._window_start >= self.WINDOW:
+            return self._window_count * 60.0 / (now - self._window_start)
+        return self.rate
+
+
+class DeviceTelemetry:
+    """Link performance counters of one diffuser."""
+
+    def __init__(self):
+        self.write_latency = LatencyHistogram()
+        self.command_latency = {"warm": LatencyStats(), "cold": LatencyStats()}
+        self.notifications = RateMeter()
+        self.handshake = LatencyStats()
+        self.time_to_reconnect = LatencyStats()
+        self.connects = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.source = None  # Adapter or proxy of the current or last connection
+        self.advertisement_source = None  # Adapter or proxy that heard the latest advertisement
+        self.rssi = None
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "advertisement_source": self.advertisement_source,
+            "rssi": self.rssi,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "disconnects": self.disconnects,
+            "reconnects": self.reconnects,
+            "notifications": self.notifications.total,
+            "notifications_per_minute": round(self.notifications.per_minute(time.monotonic()), 2),
+            "write_latency": self.write_latency.as_dict(),
+            "command_latency": {path: stats.as_dict() for path, stats in self.command_latency.items()},
+            "handshake": self.handshake.as_dict(),
+            "time_to_reconnect": self.time_to_reconnect.as_dict(),
+        }
@@ -0,0 +1,57 @@
+"""How DeviceManager reaches a diffuser.
+
+The default transport goes through Home Assistant's Bluetooth integration and
+bleak-retry-connector. Anything with the same methods can be passed to
+``DeviceManager`` instead, e.g. the simulated diffuser used by the benchmarks.
+"""
+from bleak import BleakClient
+from bleak_retry_connector import establish_connection
+from homeassistant.components import bluetooth
+
+from .path_scores import PathCandidate
+
+
+class BleakTransport:
+    def __init__(self, hass):
+        self.hass = hass
+
+    def find_device(self, address):
+        """Return the latest connectable BLEDevice for ``address``, or None."""
+        return bluetooth.async_ble_device_from_address(self.hass, address.upper(), connectable=True)
+
+    def candidates(self, address):
+        """Return a PathCandidate for every connectable scanner that currently hears ``address``."""
+        free = {}
+        # Slot allocations are only reported by newer Home Assistant versions and some scanners.
+        current_allocations = getattr(bluetooth, "async_current_allocations", None)
+        if current_allocations is not None:
+            for allocation in current_allocations(self.hass) or ():
+                free[allocation.source] = allocation.free
+        return [
+            PathCandidate(device.ble_device, device.scanner.source, device.advertisement.rssi,
+                          free.get(device.scanner.source))
+            for device in bluetooth.async_scanner_devices_by_address(self.hass, address.upper(), connectable=True)
+        ]
+
+    @staticmethod
+    def source(ble_device):
+        """Return the adapter or proxy a BLEDevice was seen through."""
+        details = getattr(ble_device, "details", None)
+        return details.get("source") if isinstance(details, dict) else None
+
+    def last_service_info(self, address):
+        """Return the latest advertisement of ``address``, for RSSI and source."""
+        return bluetooth.async_last_service_info(self.hass, address.upper(), connectable=True)
+
+    async def connect(self, ble_device, name, disconnected_callback, ble_device_callback):
+        # Use bleak-retry-connector for more reliable connections
+        return await establish_connection(
+            BleakClient,
+            ble_device,
+            name=name,
+            disconnected_callback=disconnected_callback,
+            timeout=10.0,  # 10 second timeout as recommended
+            max_attempts=3,
+            use_services_cache=True,
+            ble_device_callback=ble_device_callback,
+        )
@@ -0,0 +1,17 @@
+"""Make the integration's protocol modules importable without Home Assistant."""
+import importlib
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.jpoyson_aroma_diffuser"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+if PACKAGE not in sys.modules:
+    # The package __init__ pulls in Home Assistant; codec and frame_reader do not need it.
+    importlib.import_module("custom_components")
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(ROOT / "custom_components" / "jpoyson_aroma_diffuser")]
+    sys.modules[PACKAGE] = package
@@ -0,0 +1,60 @@
+import pytest
+
+from custom_components.jpoyson_aroma_diffuser import codec
+
+# Frames as the original hand-written encoder built them
+CONTROL_ON = bytes.fromhex("A5FA01FF010000173B000F00B4B5")
+CONTROL_OFF = bytes.fromhex("A5FA00FF010000173B000F00B4B4")
+QUERY_1 = bytes.fromhex("A5FC01000000A2")
+QUERY_4 = bytes.fromhex("A5FC04000000A5")
+CLOCK = bytes.fromhex("A5FD030C22380000000000000B")
+STATUS = bytes.fromhex("A5FB017F02081E1400012C0E10A7")
+
+ALL_DAY = codec.TimerSlot(255, 0, 0, 23, 59, 15, 180)
+
+
+@pytest.mark.parametrize("power, expected", [(1, CONTROL_ON), (0, CONTROL_OFF)])
+def test_encode_control_matches_baseline(power, expected):
+    assert codec.encode_control(power, *ALL_DAY[:1], 1, *ALL_DAY[1:]) == expected
+
+
+@pytest.mark.parametrize("slot, expected", [(1, QUERY_1), (4, QUERY_4)])
+def test_encode_query_matches_baseline(slot, expected):
+    assert codec.encode_query(slot) == expected
+
+
+def test_encode_clock_matches_baseline():
+    assert codec.encode_clock(3, 12, 34, 56) == CLOCK
+
+
+def test_decode_control():
+    frame = codec.decode_frame(CONTROL_ON)
+    assert frame == codec.SlotFrame(codec.FRAME_CONTROL, True, 1, ALL_DAY)
+
+
+def test_decode_status():
+    frame = codec.decode_frame(STATUS)
+    assert frame == codec.SlotFrame(codec.FRAME_STATUS, True, 2, codec.TimerSlot(0x7F, 8, 30, 20, 0, 300, 3600))
+
+
+def test_status_round_trip():
+    timer = codec.TimerSlot(0x7F, 8, 30, 20, 0, 300, 3600)
+    assert codec.encode_status(1, 2, timer) == STATUS
+    assert codec.decode_frame(codec.encode_status(0, 3, timer)) == codec.SlotFrame(
+        codec.FRAME_STATUS, False, 3, timer)
+
+
+def test_query_and_clock_round_trip():
+    assert codec.decode_frame(QUERY_4) == codec.QueryFrame(4)
+    assert codec.decode_frame(CLOCK) == codec.ClockFrame(3, 12, 34, 56)
+
+
+def test_decode_rejects_bad_checksum():
+    with pytest.raises(codec.ChecksumError):
+        codec.decode_frame(STATUS[:-1] + bytes([STATUS[-1] ^ 0xFF]))
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00\xFB", b"\xA5\x00\x00", STATUS[:-2]])
+def test_decode_rejects_malformed(data):
+    with pytest.raises(codec.FrameError):
+        codec.decode_frame(data)
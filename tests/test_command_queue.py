@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from custom_components.jpoyson_aroma_diffuser.command_queue import (
+    CommandQueue, PRIORITY_CLOCK, PRIORITY_POWER, PRIORITY_QUERY,
+)
+
+
+class GatedWriter:
+    """Records written frames; writes block until the gate opens."""
+
+    def __init__(self):
+        self.frames = []
+        self.gate = asyncio.Event()
+
+    async def __call__(self, frame, response):
+        await self.gate.wait()
+        self.frames.append(frame)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    writer = GatedWriter()
+    queue = CommandQueue(writer)
+    # The first command is taken by the writer right away and holds it.
+    tasks = [asyncio.create_task(queue.submit(b"first", PRIORITY_QUERY))]
+    await settle()
+    for frame, priority in ((b"query", PRIORITY_QUERY), (b"clock", PRIORITY_CLOCK), (b"power", PRIORITY_POWER)):
+        tasks.append(asyncio.create_task(queue.submit(frame, priority)))
+    await settle()
+
+    writer.gate.set()
+    await asyncio.gather(*tasks)
+    assert writer.frames == [b"first", b"power", b"clock", b"query"]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_equal_priority_keeps_submission_order():
+    writer = GatedWriter()
+    queue = CommandQueue(writer)
+    tasks = [asyncio.create_task(queue.submit(bytes([i]), PRIORITY_QUERY)) for i in range(4)]
+    await settle()
+    writer.gate.set()
+    await asyncio.gather(*tasks)
+    assert writer.frames == [bytes([i]) for i in range(4)]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_latest_wins_coalescing():
+    writer = GatedWriter()
+    queue = CommandQueue(writer)
+    blocker = asyncio.create_task(queue.submit(b"blocker", key="clock"))
+    await settle()
+    first = asyncio.create_task(queue.submit(b"on", key="power"))
+    second = asyncio.create_task(queue.submit(b"off", key="power"))
+    await settle()
+    assert len(queue) == 1
+
+    writer.gate.set()
+    await asyncio.gather(blocker, first, second)
+    # Both submitters are resolved by the single write of the latest frame.
+    assert writer.frames == [b"blocker", b"off"]
+    assert queue.coalesced == 1
+    assert queue.written == 2
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_written_command_is_not_coalesced():
+    writer = GatedWriter()
+    writer.gate.set()
+    queue = CommandQueue(writer)
+    await queue.submit(b"on", key="power")
+    await queue.submit(b"off", key="power")
+    assert writer.frames == [b"on", b"off"]
+    assert queue.coalesced == 0
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_clear_fails_waiters():
+    writer = GatedWriter()
+    queue = CommandQueue(writer)
+    blocker = asyncio.create_task(queue.submit(b"blocker"))
+    await settle()
+    waiting = [asyncio.create_task(queue.submit(frame, key=frame)) for frame in (b"a", b"b")]
+    await settle()
+
+    queue.clear(ConnectionError("link lost"))
+    for task in waiting:
+        with pytest.raises(ConnectionError, match="link lost"):
+            await task
+    assert len(queue) == 0
+
+    writer.gate.set()
+    await blocker
+    # Keys of cleared commands no longer coalesce with new submissions.
+    await queue.submit(b"c", key=b"a")
+    assert writer.frames == [b"blocker", b"c"]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_error_fails_only_that_command():
+    frames = []
+
+    async def write(frame, response):
+        if frame == b"bad":
+            raise ConnectionError("write failed")
+        frames.append(frame)
+
+    queue = CommandQueue(write)
+    with pytest.raises(ConnectionError):
+        await queue.submit(b"bad")
+    await queue.submit(b"good")
+    assert frames == [b"good"]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_queued_commands():
+    writer = GatedWriter()
+    queue = CommandQueue(writer)
+    blocker = asyncio.create_task(queue.submit(b"blocker"))
+    await settle()
+    waiting = asyncio.create_task(queue.submit(b"queued"))
+    await settle()
+
+    await queue.stop()
+    with pytest.raises(asyncio.CancelledError):
+        await blocker
+    with pytest.raises(ConnectionError):
+        await waiting
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from custom_components.jpoyson_aroma_diffuser.connection_broker import (
+    ConnectionBroker, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE,
+)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Holder:
+    """Holds a ticket until released, recording the order of admission."""
+
+    def __init__(self, ticket, admitted):
+        self.ticket = ticket
+        self.release = asyncio.Event()
+        self.admitted = admitted
+        self.task = asyncio.create_task(self._hold())
+
+    async def _hold(self):
+        async with self.ticket:
+            self.admitted.append(self)
+            await self.release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admission_limit_per_source():
+    broker = ConnectionBroker(concurrent_connects=2)
+    admitted = []
+    holders = [Holder(broker.ticket("proxy"), admitted) for _ in range(3)]
+    other = Holder(broker.ticket("adapter"), admitted)
+    await settle()
+
+    assert admitted == [holders[0], holders[1], other]
+    assert broker.free_slots("proxy") == 0
+    assert broker.free_slots("adapter") == 1
+    assert broker.queue_depth("proxy") == 1
+
+    holders[0].release.set()
+    await settle()
+    assert admitted[-1] is holders[2]
+    assert broker.free_slots("proxy") == 0
+
+    for holder in holders[1:] + [other]:
+        holder.release.set()
+    await asyncio.gather(*(holder.task for holder in holders + [other]))
+    assert broker.free_slots("proxy") == 2
+    assert broker.metrics()["proxy"]["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_interactive_before_background():
+    broker = ConnectionBroker(concurrent_connects=1)
+    admitted = []
+    first = Holder(broker.ticket("proxy", PRIORITY_BACKGROUND), admitted)
+    await settle()
+    background = Holder(broker.ticket("proxy", PRIORITY_BACKGROUND), admitted)
+    interactive = Holder(broker.ticket("proxy", PRIORITY_INTERACTIVE), admitted)
+    await settle()
+
+    for holder in (first, interactive, background):
+        holder.release.set()
+    await asyncio.gather(first.task, background.task, interactive.task)
+    assert admitted == [first, interactive, background]
+
+
+@pytest.mark.asyncio
+async def test_promote_moves_a_queued_ticket_ahead():
+    broker = ConnectionBroker(concurrent_connects=1)
+    admitted = []
+    first = Holder(broker.ticket("proxy"), admitted)
+    await settle()
+    earlier = Holder(broker.ticket("proxy"), admitted)
+    later = Holder(broker.ticket("proxy"), admitted)
+    await settle()
+
+    later.ticket.promote(PRIORITY_INTERACTIVE)
+    # Promoting to a lower priority than the current one is ignored.
+    earlier.ticket.promote(PRIORITY_BACKGROUND)
+    for holder in (first, earlier, later):
+        holder.release.set()
+    await asyncio.gather(first.task, earlier.task, later.task)
+    assert admitted == [first, later, earlier]
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_queued_releases_nothing():
+    broker = ConnectionBroker(concurrent_connects=1)
+    admitted = []
+    first = Holder(broker.ticket("proxy"), admitted)
+    await settle()
+    cancelled = Holder(broker.ticket("proxy"), admitted)
+    waiting = Holder(broker.ticket("proxy"), admitted)
+    await settle()
+
+    cancelled.task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled.task
+    assert broker.queue_depth("proxy") == 1
+
+    first.release.set()
+    await settle()
+    # The cancelled ticket is skipped and never held a slot.
+    assert admitted == [first, waiting]
+    assert broker.free_slots("proxy") == 0
+
+    waiting.release.set()
+    await asyncio.gather(first.task, waiting.task)
+    assert broker.free_slots("proxy") == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_held_releases_the_slot():
+    broker = ConnectionBroker(concurrent_connects=1)
+    admitted = []
+    holder = Holder(broker.ticket("proxy"), admitted)
+    await settle()
+    assert broker.free_slots("proxy") == 0
+
+    holder.task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await holder.task
+    assert broker.free_slots("proxy") == 1
@@ -0,0 +1,82 @@
+from custom_components.jpoyson_aroma_diffuser import codec
+from custom_components.jpoyson_aroma_diffuser.frame_reader import FrameReader
+
+TIMER = codec.TimerSlot(255, 0, 0, 23, 59, 15, 180)
+STATUS_1 = codec.encode_status(1, 1, TIMER)
+STATUS_2 = codec.encode_status(0, 2, TIMER)
+
+
+def slots(frames):
+    return [frame.slot for frame in frames]
+
+
+def test_single_frame():
+    reader = FrameReader()
+    assert slots(reader.feed(STATUS_1)) == [1]
+    assert reader.pending == 0
+
+
+def test_frame_split_across_notifications():
+    reader = FrameReader()
+    assert reader.feed(STATUS_1[:1]) == []
+    assert reader.feed(STATUS_1[1:5]) == []
+    assert slots(reader.feed(STATUS_1[5:])) == [1]
+    assert reader.pending == 0
+
+
+def test_several_frames_in_one_notification():
+    reader = FrameReader()
+    frames = reader.feed(STATUS_1 + STATUS_2 + codec.encode_query(3))
+    assert [type(frame) for frame in frames] == [codec.SlotFrame, codec.SlotFrame, codec.QueryFrame]
+    assert slots(frames) == [1, 2, 3]
+    assert reader.frames == 3
+
+
+def test_coalesced_frames_with_trailing_fragment():
+    reader = FrameReader()
+    assert slots(reader.feed(STATUS_1 + STATUS_2[:6])) == [1]
+    assert reader.pending == 6
+    assert slots(reader.feed(STATUS_2[6:])) == [2]
+
+
+def test_garbage_before_header():
+    reader = FrameReader()
+    assert slots(reader.feed(b"\x00\x13\x37" + STATUS_1)) == [1]
+    assert reader.resyncs == 1
+    assert reader.pending == 0
+
+
+def test_stray_header_byte():
+    reader = FrameReader()
+    # 0xA5 followed by an unknown frame type is not a frame start.
+    assert slots(reader.feed(b"\xA5\x00" + STATUS_1)) == [1]
+    assert reader.resyncs >= 1
+    assert reader.pending == 0
+
+
+def test_garbage_without_header_is_dropped():
+    reader = FrameReader()
+    assert reader.feed(b"\x01\x02\x03") == []
+    assert reader.pending == 0
+
+
+def test_bad_checksum_then_valid_frame():
+    reader = FrameReader()
+    corrupt = STATUS_1[:-1] + bytes([STATUS_1[-1] ^ 0xFF])
+    assert slots(reader.feed(corrupt + STATUS_2)) == [2]
+    assert reader.bad_checksums == 1
+    assert reader.pending == 0
+
+
+def test_truncated_frame_followed_by_valid_frame():
+    reader = FrameReader()
+    # A frame cut short by a lost fragment; its header must not swallow the next frame.
+    assert slots(reader.feed(STATUS_1[:7] + STATUS_2)) == [2]
+
+
+def test_reset_drops_partial_frame():
+    reader = FrameReader()
+    reader.feed(STATUS_1[:4])
+    reader.reset()
+    assert reader.pending == 0
+    assert slots(reader.feed(STATUS_2)) == [2]
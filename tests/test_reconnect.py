@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from custom_components.jpoyson_aroma_diffuser.reconnect import ReconnectSupervisor
+
+
+class FakeDevice:
+    """Connect callable whose outcome the test controls."""
+
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def connect(self):
+        self.calls += 1
+        await self.gate.wait()
+        return self.reachable
+
+
+def supervisor(device, **kwargs):
+    changes = []
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.001)
+    sup = ReconnectSupervisor("test", device.connect, lambda coro, name: asyncio.create_task(coro, name=name),
+                              on_circuit_change=lambda: changes.append(sup.circuit_open), **kwargs)
+    return sup, changes
+
+
+@pytest.mark.asyncio
+async def test_single_flight():
+    device = FakeDevice()
+    device.gate.clear()
+    sup, _ = supervisor(device)
+
+    task = sup.request()
+    assert sup.request() is task
+    waiters = [asyncio.create_task(sup.wait(1.0)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert device.calls == 1
+
+    device.gate.set()
+    assert await asyncio.gather(*waiters) == [True, True, True]
+    assert device.calls == 1
+    assert not sup.running
+    await sup.stop()
+
+
+@pytest.mark.asyncio
+async def test_retries_until_connected():
+    device = FakeDevice(reachable=False)
+    sup, changes = supervisor(device, failure_threshold=10)
+    sup.request()
+    while device.calls < 3:
+        await asyncio.sleep(0.001)
+    device.reachable = True
+    assert await sup.wait(1.0)
+    assert sup.failures == 0
+    # The circuit never opened.
+    assert changes == []
+    await sup.stop()
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_closes():
+    device = FakeDevice(reachable=False)
+    sup, changes = supervisor(device, failure_threshold=2, cooldown=0.1)
+    sup.request()
+    while not sup.circuit_open:
+        await asyncio.sleep(0.001)
+
+    assert sup.tripped
+    assert changes == [True]
+    # Waiters fail fast while the circuit is open.
+    assert await sup.wait(1.0) is False
+    calls = device.calls
+
+    # The cooldown ends, the circuit closes and the next attempt runs.
+    device.reachable = True
+    assert await asyncio.wait_for(sup.request(), 1.0)
+    assert device.calls == calls + 1
+    assert not sup.circuit_open
+    assert not sup.tripped
+    assert changes[:2] == [True, False]
+    await sup.stop()
+
+
+@pytest.mark.asyncio
+async def test_tripped_until_a_connect_succeeds():
+    device = FakeDevice(reachable=False)
+    sup, changes = supervisor(device, failure_threshold=1, cooldown=0.02)
+    sup.request()
+    while device.calls < 3:
+        await asyncio.sleep(0.005)
+    # The circuit closes between cooldowns, but the outage is not over.
+    assert sup.tripped
+    await sup.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_the_loop():
+    device = FakeDevice()
+    device.gate.clear()
+    sup, _ = supervisor(device)
+    sup.request()
+    await asyncio.sleep(0)
+    await sup.stop()
+    assert not sup.running
+    assert device.calls == 1